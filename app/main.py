@@ -53,6 +53,14 @@ except ImportError as e:
         logger.error(traceback.format_exc())
         raise
 
+# Import du préchargement des modèles du chatbot
+try:
+    from backend.app.services.chatbot import start_model_warmup, start_executor, shutdown_executor
+    from backend.app.services.chatbot import start_content_watcher, stop_content_watcher, close_sessions
+except ImportError:
+    from .services.chatbot import start_model_warmup, start_executor, shutdown_executor
+    from .services.chatbot import start_content_watcher, stop_content_watcher, close_sessions
+
 logger.info("All imports completed successfully")
 
 # Initialisation de l'application FastAPI
@@ -129,11 +137,25 @@ async def test_endpoint():
 
 logger.info("API startup complete, ready to accept requests")
 
+# Charger les modèles lourds en arrière-plan une fois l'API démarrée
+@app.on_event("startup")
+async def startup_event():
+    logger.info("Starting background model warmup...")
+    start_model_warmup()
+    # Pool de threads pour le traitement des messages (CHATBOT_EXECUTOR_WORKERS)
+    start_executor()
+    # Rechargement à chaud du contenu (CONTENT_WATCH_INTERVAL, 0 pour désactiver)
+    start_content_watcher()
+
 # Ajouter un gestionnaire d'événements pour intercepter l'arrêt
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.warning("Application is shutting down! This might be unexpected.")
     logger.warning(traceback.format_exc())
+    stop_content_watcher()
+    shutdown_executor()
+    # Sessions en cours écrites dans l'instantané (reprise après redéploiement)
+    close_sessions()
 
 if __name__ == "__main__":
     import uvicorn
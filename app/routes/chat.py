@@ -1,4 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Form, Header
+from fastapi.responses import StreamingResponse
+import os
+import hmac
+import json
+import time
 import logging
 from typing import List, Optional
 from pydantic import BaseModel
@@ -9,12 +14,20 @@ try:
     from backend.app.utils.auth import get_current_user
     from backend.app.services.firebase import get_firestore_client, get_auth
     from backend.app.services.chatbot import process_input #, update_user_progress, get_user_progress
+    from backend.app.services.chatbot import models_status, metrics_snapshot, chat_executor
+    from backend.app.services.chatbot import reload_content, content_status
+    from backend.app.services.chatbot import stream_grammar_correction, cached_grammar_correction
+    from backend.app.services.chatbot.metrics import histogram
 except ImportError:
     # Fallback pour les imports relatifs
     from ..models.schemas import ChatMessage, ChatResponse
     from ..utils.auth import get_current_user
     from ..services.firebase import get_firestore_client, get_auth
     from ..services.chatbot import process_input #, update_user_progress, get_user_progress
+    from ..services.chatbot import models_status, metrics_snapshot, chat_executor
+    from ..services.chatbot import reload_content, content_status
+    from ..services.chatbot import stream_grammar_correction, cached_grammar_correction
+    from ..services.chatbot.metrics import histogram
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
@@ -41,6 +54,43 @@ async def test_endpoint():
     """
     return {"status": "success", "message": "API Chatbot fonctionnelle"}
 
+# Jeton requis pour les endpoints d'administration (désactivés s'il n'est pas défini)
+CHATBOT_ADMIN_TOKEN = os.getenv("CHATBOT_ADMIN_TOKEN", "")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dépendance des endpoints d'administration : en-tête X-Admin-Token égal à CHATBOT_ADMIN_TOKEN
+    """
+    # Comparaison à temps constant ; en octets, le jeton reçu peut contenir n'importe quel caractère
+    if not CHATBOT_ADMIN_TOKEN or not hmac.compare_digest(
+        (x_admin_token or "").encode("utf-8"), CHATBOT_ADMIN_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Accès refusé")
+
+@router.get("/status", dependencies=[Depends(require_admin)])
+async def status_endpoint():
+    """
+    État de chargement des modèles du chatbot (temps de chargement inclus)
+    """
+    return {"status": "success", "models": models_status(), "content": content_status()}
+
+@router.post("/admin/reload", dependencies=[Depends(require_admin)])
+async def reload_content_endpoint(force: bool = False):
+    """
+    Recharge le contenu du chatbot (quiz, contextes, recettes, ...) sans redémarrage
+    """
+    report = await chat_executor.run("admin:content", reload_content, force)
+    if report["errors"]:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=report)
+    return {"status": "success", "content": report}
+
+@router.get("/metrics", dependencies=[Depends(require_admin)])
+async def metrics_endpoint():
+    """
+    Métriques internes du chatbot (taille des lots, attente en file, ...)
+    """
+    return {"status": "success", "metrics": metrics_snapshot()}
+
 @router.post("/")
 async def chat_endpoint(
     chat_message: ChatMessage,
@@ -51,7 +101,8 @@ async def chat_endpoint(
     """
     try:
         user_id = current_user["uid"]
-        response = process_input(chat_message.message, user_id)
+        # Traitement hors de la boucle asyncio, dans l'ordre des messages de l'utilisateur
+        response = await chat_executor.run(user_id, process_input, chat_message.message, user_id)
         return response
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
@@ -60,6 +111,60 @@ async def chat_endpoint(
             detail="Une erreur est survenue lors du traitement de votre message"
         )
 
+# Temps jusqu'au premier token du streaming de correction (génération par le modèle seulement)
+grammar_ttft = histogram("grammar_stream_ttft_seconds", (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0))
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _grammar_event_stream(sentence, user_id):
+    # Générateur synchrone : Starlette l'itère dans son pool de threads
+    start = time.perf_counter()
+    ttft = None
+    pieces = []
+    try:
+        cached = cached_grammar_correction(sentence)
+        # Une correction en cache arrive d'un bloc : elle fausserait l'histogramme du modèle
+        source = [cached] if cached is not None else stream_grammar_correction(sentence, check_cache=False)
+        for piece in source:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+                if cached is None:
+                    grammar_ttft.observe(ttft)
+            pieces.append(piece)
+            yield _sse("token", {"text": piece})
+    except Exception as e:
+        logger.error(f"Error in grammar stream for {user_id}: {e}")
+        yield _sse("error", {"detail": "Erreur lors de la correction"})
+        return
+    if ttft is None:
+        # Aucun morceau produit : le modèle est en cours de chargement, ou son chargement a échoué
+        failed = models_status()["grammar_corrector"]["state"] == "failed"
+        yield _sse("error", {"detail": "unavailable" if failed else "warming_up"})
+        return
+    total = time.perf_counter() - start
+    logger.info(f"Grammar stream user={user_id} cached={cached is not None} ttft={ttft * 1000:.0f}ms total={total * 1000:.0f}ms")
+    yield _sse("done", {
+        "corrected": ''.join(pieces).strip(),
+        "cached": cached is not None,
+        "ttft_ms": round(ttft * 1000, 1),
+        "total_ms": round(total * 1000, 1),
+    })
+
+@router.post("/grammar/stream")
+async def grammar_stream_endpoint(
+    chat_message: ChatMessage,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Corrige une phrase en envoyant les tokens générés au fil de l'eau (Server-Sent Events)
+    """
+    return StreamingResponse(
+        _grammar_event_stream(chat_message.message, current_user["uid"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # @router.post("/progress")
 # async def update_progress_endpoint(
 #     progress: ProgressUpdate,
@@ -111,7 +216,7 @@ async def send_message(message: ChatMessage, current_user: dict = Depends(get_cu
         user_id = current_user['uid']
         
         # Traiter le message avec notre chatbot
-        chatbot_response = process_input(message.message, user_id)
+        chatbot_response = await chat_executor.run(user_id, process_input, message.message, user_id)
         
         # Si la réponse est un str (cas gestion d'état), l'envelopper dans un dict
         if isinstance(chatbot_response, str):
@@ -1 +1,35 @@
-from .chatbot import process_input 
\ No newline at end of file
+"""
+Noms publics du chatbot, importés à la première utilisation : importer un
+sous-module (sessions, review, content, ...) ne charge ni le contenu ni les
+modèles de chatbot.py.
+"""
+import importlib
+
+# Nom public -> sous-module qui le définit
+_EXPORTS = {
+    "process_input": "chatbot",
+    "stream_grammar_correction": "chatbot",
+    "cached_grammar_correction": "chatbot",
+    "start_content_watcher": "chatbot",
+    "stop_content_watcher": "chatbot",
+    "reload_content": "chatbot",
+    "content_status": "chatbot",
+    "close_sessions": "chatbot",
+    "start_model_warmup": "model_manager",
+    "models_status": "model_manager",
+    "metrics_snapshot": "metrics",
+    "chat_executor": "executor",
+    "start_executor": "executor",
+    "shutdown_executor": "executor",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,93 @@
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+
+from .metrics import histogram
+
+# Initialisation du logger
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class MicroBatcher:
+    """
+    Regroupe les appels concurrents en lots pour un seul appel de `run_batch`.
+
+    Un thread dédié prend le premier élément en attente puis collecte les
+    suivants jusqu'à `max_batch_size` éléments ou `max_wait_ms` millisecondes.
+    `run_batch(items)` doit retourner une liste de résultats dans le même
+    ordre ; chaque appelant de submit() reçoit son propre résultat.
+    """
+
+    def __init__(self, name, run_batch, max_batch_size=8, max_wait_ms=10):
+        self.name = name
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batch_size_hist = histogram(f"{name}_batch_size", BATCH_SIZE_BUCKETS)
+        self.queue_wait_hist = histogram(f"{name}_queue_wait_seconds", QUEUE_WAIT_BUCKETS)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._worker, name=f"batcher-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, item, timeout=None):
+        """Ajoute `item` au prochain lot et attend son résultat."""
+        return self.submit_many([item], timeout=timeout)[0]
+
+    def submit_many(self, items, timeout=None):
+        """Comme submit(), pour plusieurs éléments ; les résultats suivent l'ordre de `items`."""
+        self._ensure_worker()
+        now = time.perf_counter()
+        futures = []
+        for item in items:
+            future = Future()
+            self._queue.put((item, future, now))
+            futures.append(future)
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                self.queue_wait_hist.observe(started - enqueued_at)
+            self.batch_size_hist.observe(len(batch))
+            items = [item for item, _, _ in batch]
+            try:
+                results = self._run_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: {len(results)} résultats pour {len(items)} entrées"
+                    )
+            except Exception as e:
+                logger.error(f"[BATCH] Échec du lot '{self.name}' ({len(items)} éléments) : {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,138 @@
+import re
+import time
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+
+from .metrics import counter
+
+# Initialisation du logger
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    Cache borné : éviction LRU au-delà de `max_size` entrées et expiration
+    après `ttl` secondes (ttl=None : pas d'expiration).
+    Les compteurs hits/misses/evictions sont publiés dans le registre de métriques.
+    """
+
+    def __init__(self, name, max_size=1024, ttl=None):
+        self.name = name
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = counter(f"{name}_cache_hits")
+        self.misses = counter(f"{name}_cache_misses")
+        self.evictions = counter(f"{name}_cache_evictions")
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits.inc()
+                    return value
+                del self._data[key]
+                self.evictions.inc()
+        self.misses.inc()
+        return default
+
+    def set(self, key, value, created_at=None):
+        created_at = time.time() if created_at is None else created_at
+        expires_at = created_at + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions.inc()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_PUNCT_RE = re.compile(r"[^\w\s']+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_sentence(sentence):
+    """Clé de cache : minuscules, ponctuation retirée, espaces compactés."""
+    s = _PUNCT_RE.sub(" ", sentence.lower())
+    return _SPACES_RE.sub(" ", s).strip()
+
+
+class GrammarCache:
+    """
+    Cache des corrections grammaticales, indexé sur la phrase normalisée.
+    Si `db_path` est fourni, les entrées sont aussi écrites dans un fichier
+    SQLite et rechargées au démarrage pour ne pas repartir à froid.
+    """
+
+    def __init__(self, max_size=2048, ttl=86400, db_path=None):
+        self._cache = LRUTTLCache("grammar", max_size=max_size, ttl=ttl)
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            try:
+                self._open_db(db_path)
+            except sqlite3.Error as e:
+                logger.error(f"[CACHE] SQLite indisponible ({db_path}) : {e}")
+                self._db = None
+
+    def _open_db(self, db_path):
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS grammar_cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        ttl = self._cache.ttl
+        if ttl:
+            self._db.execute("DELETE FROM grammar_cache WHERE created_at < ?", (time.time() - ttl,))
+        # Le fichier reste borné : on ne garde que les entrées les plus récentes
+        self._db.execute(
+            "DELETE FROM grammar_cache WHERE key NOT IN "
+            "(SELECT key FROM grammar_cache ORDER BY created_at DESC LIMIT ?)",
+            (self._cache.max_size,),
+        )
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, value, created_at FROM grammar_cache ORDER BY created_at DESC LIMIT ?",
+            (self._cache.max_size,),
+        ).fetchall()
+        # Insertion du plus ancien au plus récent pour conserver l'ordre LRU
+        for key, value, created_at in reversed(rows):
+            self._cache.set(key, value, created_at=created_at)
+        logger.info(f"[CACHE] {len(rows)} corrections rechargées depuis {db_path}")
+
+    def get(self, sentence):
+        return self._cache.get(normalize_sentence(sentence))
+
+    def set(self, sentence, corrected):
+        key = normalize_sentence(sentence)
+        now = time.time()
+        self._cache.set(key, corrected, created_at=now)
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO grammar_cache (key, value, created_at) VALUES (?, ?, ?)",
+                        (key, corrected, now),
+                    )
+                    self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"[CACHE] Écriture SQLite impossible : {e}")
+
+    def __len__(self):
+        return len(self._cache)
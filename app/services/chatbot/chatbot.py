@@ -2,13 +2,25 @@ import json
 import random
 import re
 import os
-import unicodedata
 from pathlib import Path
-from transformers import pipeline
 from langdetect import detect
 from deep_translator import GoogleTranslator
-import joblib
 import logging
+from .model_manager import grammar_model, load_intent_models, predict_intents_with, GRAMMAR_MODEL_WAIT, MODEL_BACKEND
+from .batching import MicroBatcher
+from .cache import GrammarCache, LRUTTLCache
+from .context_index import ThemeIndex
+from .context_search import ContextSearch
+from .context_vectors import ContextVectors, VECTOR_MODES
+from .context_render import render_context, render_theme_menu, paginate, render_page
+from .content import ContentRegistry, validated_key, validate_contexts, validate_recipes, validate_intents, validate_dict
+from .normalizer import normalize_text, normalize_darija
+from .sessions import create_session_store
+from .session_record import ChatSession
+from .user_locks import UserLocks
+from .quiz_bank import QuizBuildReport, compile_quiz_bank
+from .review import create_review_store
+from .recipes import RecipeIndex, render_recipe, render_recipe_list, render_step, step_count
 
 # Initialisation du logger
 logger = logging.getLogger(__name__)
@@ -19,11 +31,15 @@ PROJECT_ROOT = Path(__file__).resolve().parents[4]
 DATA_DIR = PROJECT_ROOT / "data"
 MODEL_DIR = Path(__file__).resolve().parents[2] / "data" / "chatbot"
 
-# Gestion de session utilisateur en mémoire
-user_sessions = {}
+# Sessions utilisateur : store configurable (CHATBOT_SESSION_BACKEND), même interface qu'un dict
+user_sessions = create_session_store()
+# Sérialise les messages d'un même utilisateur (voir user_locks)
+user_locks = UserLocks()
+# Plannings de révision espacée par utilisateur et par langue, sur le backend des sessions (voir review)
+review_store = create_review_store()
 
 # Etats possibles : 'inactive', 'waiting_language', 'main_menu', 'in_module'
-# Structure : user_sessions[user_id] = {'state': ..., 'language': ..., ...}
+# Structure : user_sessions[user_id] = ChatSession(state=..., language=..., ...) (voir session_record)
 
 # Liste des salutations reconnues pour activer le bot
 ACTIVATION_GREETINGS = [
@@ -45,24 +61,57 @@ def load_json_data(filename):
         return {}
 
 # Chargement centralisé de toutes les données
-quiz_data_fr = load_json_data("quiz_by_level_no_theme.json")
-quiz_data_en = load_json_data("quiz_by_level_english.json")
-quiz_data_ar = load_json_data("quiz_by_level_darija.json")
-context_data_main = load_json_data("enriched_contexts_with_martyrs.json")
-context_data_extra = load_json_data("contexts.json")
-recettes_data = load_json_data("recettes_algeriennes_etapes_detaillees_complet.json")
-translations = load_json_data("translations.json")
+# Contenu pédagogique : instantanés rechargeables à chaud (voir content.py)
+CONTENT_FILES = {
+    'quiz_fr': "quiz_by_level_no_theme.json",
+    'quiz_en': "quiz_by_level_english.json",
+    'quiz_ar': "quiz_by_level_darija.json",
+    'context_main': "enriched_contexts_with_martyrs.json",
+    'context_extra': "contexts.json",
+    'recettes': "recettes_algeriennes_etapes_detaillees_complet.json",
+    'translations': "translations.json",
+    'intents': "intent_dataset_enriched.json",
+}
+content_registry = ContentRegistry(DATA_DIR, CONTENT_FILES, validators={
+    # Une question dont la réponse ne correspond à aucune option fait refuser le fichier ;
+    # la banque compilée est gardée dans l'instantané (validated_key) et sert de banque de quiz
+    'quiz_fr': compile_quiz_bank,
+    'quiz_en': compile_quiz_bank,
+    'quiz_ar': compile_quiz_bank,
+    'context_main': validate_contexts,
+    'context_extra': validate_contexts,
+    'recettes': validate_recipes,
+    'translations': validate_dict,
+    'intents': validate_intents,
+})
 progress_data = load_json_data("progress_tracker.json")
 badges_data = load_json_data("badges.json")
-intents_data = load_json_data("intent_dataset_enriched.json")
+
+def quiz_content_name(lang):
+    return 'quiz_fr' if lang == 'fr' else 'quiz_en' if lang == 'en' else 'quiz_ar'
+
+def build_quiz_bank(snapshot, name):
+    # La banque compilée par le validateur est déjà dans l'instantané ; on n'arrive ici qu'au
+    # démarrage, pour un fichier refusé par le validateur : les questions mal formées sont écartées
+    report = QuizBuildReport()
+    bank = compile_quiz_bank(snapshot[name], report, strict=False)
+    if report.malformed:
+        logger.warning(f"[QUIZ] {name} : {len(report.malformed)} question(s) mal formée(s) écartée(s) : "
+                       + "; ".join(f"{where} : {message}" for where, message in report.malformed))
+    return bank
+
+def quiz_bank_for(lang):
+    """Banque compilée (voir quiz_bank) de la langue, une fois par instantané de contenu."""
+    name = quiz_content_name(lang)
+    return content_registry.current().derived(validated_key(name), lambda snapshot: build_quiz_bank(snapshot, name))
 
 # --- Fonction utilitaire pour poser une question de quiz au bon niveau, dans l'ordre du fichier JSON ---
 def ask_quiz_question(user_id):
     session = user_sessions.get(user_id)
     lang = session.get('language', 'fr')
     level = session.get('quiz_level', 'beginner')
-    quiz_data = quiz_data_fr if lang == 'fr' else quiz_data_en if lang == 'en' else quiz_data_ar
-    questions = quiz_data.get(level, [])
+    bank = quiz_bank_for(lang)
+    questions = bank.level(level)
     if not questions:
         if lang == 'fr':
             return "Aucune question disponible pour ce niveau."
@@ -70,13 +119,13 @@ def ask_quiz_question(user_id):
             return "No questions available for this level."
         else:
             return "لا توجد أسئلة لهذا المستوى."
-    # Index de progression séquentielle
-    idx = session.get('quiz_question_index', 0)
+    # Index de progression séquentielle ; les questions déjà répondues sont sautées
+    idx = first_unseen_question(user_id, lang, questions, session.get('quiz_question_index', 0))
     if idx >= len(questions):
         session['state'] = 'main_menu'
         session.pop('quiz_question_index', None)
         session.pop('quiz_level', None)
-        session.pop('current_quiz', None)
+        session.pop('quiz_question', None)
         user_sessions[user_id] = session
         if lang == 'fr':
             return "Tu as terminé toutes les questions de ce niveau ! Tape 'menu' pour revenir au menu principal."
@@ -84,20 +133,41 @@ def ask_quiz_question(user_id):
             return "You have finished all questions for this level! Type 'menu' to return to the main menu."
         else:
             return "أنهيت جميع أسئلة هذا المستوى! اكتب 'menu' للعودة إلى القائمة الرئيسية."
-    question_data = questions[idx]
     session['quiz_question_index'] = idx + 1
-    session['current_quiz'] = question_data if 'options' in question_data else {
-        'question': question_data['question'],
-        'options': {chr(65+i).lower(): opt for i, opt in enumerate(question_data.get('choices', []))},
-        'answer': question_data['answer'][0].lower() if isinstance(question_data['answer'], str) else question_data['answer']
-    }
+    # La session ne garde que l'identifiant de la question dans la banque
+    session['quiz_question'] = questions[idx]
     user_sessions[user_id] = session
-    return format_quiz_question(session['current_quiz'])
+    return bank.get(questions[idx]).text
+
+def first_unseen_question(user_id, lang, questions, idx):
+    """
+    Premier indice >= idx d'une question jamais répondue. L'historique des
+    questions posées est le planning de révision (review) : toute réponse
+    valide au quiz, au parcours ou en révision y inscrit l'identifiant.
+    """
+    try:
+        state = review_store.load(user_id, lang)
+    except Exception as e:
+        # Sans historique, le quiz continue dans l'ordre du fichier
+        logger.error(f"[REVIEW] Impossible de lire l'historique de {user_id} : {e}")
+        return idx
+    while idx < len(questions) and state.box(questions[idx]):
+        idx += 1
+    return idx
 
-# Chargement des modèles
-vectorizer = joblib.load(MODEL_DIR / "intent_vectorizer.pkl")
-intent_model = joblib.load(MODEL_DIR / "intent_classifier.pkl")
-grammar_corrector = pipeline('text2text-generation', model='prithivida/grammar_error_correcter_v1')
+def current_quiz_question(session):
+    """Question en cours du quiz (QuizQuestion), retrouvée dans la banque à partir de son identifiant."""
+    return quiz_bank_for(session.get('language', 'fr')).get(session.get('quiz_question'))
+
+# Chargement des modèles (en mode 'sidecar', ils sont servis par model_server)
+if MODEL_BACKEND == 'sidecar':
+    from .model_server import get_model_client
+    model_client = get_model_client()
+    vectorizer = intent_model = None
+else:
+    model_client = None
+    vectorizer, intent_model = load_intent_models()
+# Le correcteur grammatical est chargé en arrière-plan (voir model_manager)
 
 # Utilitaires
 
@@ -131,15 +201,97 @@ def rule_based_correct(sentence):
         }
     return None
 
-def correct_grammar_with_model(sentence):
-    corrected = grammar_corrector(f"gec: {sentence}", max_length=64)[0]['generated_text']
+# Micro-batching des corrections : fenêtre de collecte et taille max d'un lot
+GRAMMAR_BATCH_MAX_SIZE = int(os.getenv("GRAMMAR_BATCH_MAX_SIZE", "8"))
+GRAMMAR_BATCH_WAIT_MS = float(os.getenv("GRAMMAR_BATCH_WAIT_MS", "10"))
+
+def correct_grammar_batch(sentences):
+    return grammar_model.get().correct_batch(sentences)
+
+grammar_batcher = MicroBatcher("grammar", correct_grammar_batch, GRAMMAR_BATCH_MAX_SIZE, GRAMMAR_BATCH_WAIT_MS)
+
+# Cache des corrections (phrase normalisée -> correction), persistant si GRAMMAR_CACHE_DB est défini
+grammar_cache = GrammarCache(
+    max_size=int(os.getenv("GRAMMAR_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("GRAMMAR_CACHE_TTL", "86400")),
+    db_path=os.getenv("GRAMMAR_CACHE_DB") or None,
+)
+
+def correct_grammar_with_model(sentence, timeout=GRAMMAR_MODEL_WAIT):
+    cached = grammar_cache.get(sentence)
+    if cached is not None:
+        return cached
+    # Retourne None si le modèle est encore en cours de chargement
+    if grammar_model.get(timeout=timeout) is None:
+        return None
+    corrected = grammar_batcher.submit(sentence)
+    grammar_cache.set(sentence, corrected)
     return corrected
 
+def cached_grammar_correction(sentence):
+    """Correction déjà en cache, sinon None (sans appel au modèle)."""
+    return grammar_cache.get(sentence)
+
+def stream_grammar_correction(sentence, timeout=GRAMMAR_MODEL_WAIT, check_cache=True):
+    """
+    Générateur des morceaux de la phrase corrigée, produits pendant la génération.
+    Ne produit rien si le modèle est encore en cours de chargement.
+    check_cache=False : l'appelant a déjà consulté le cache (cached_grammar_correction).
+    """
+    if check_cache:
+        cached = grammar_cache.get(sentence)
+        if cached is not None:
+            yield cached
+            return
+    grammar_corrector = grammar_model.get(timeout=timeout)
+    if grammar_corrector is None:
+        return
+    pieces = []
+    for piece in grammar_corrector.stream(sentence):
+        pieces.append(piece)
+        yield piece
+    grammar_cache.set(sentence, ''.join(pieces).strip())
+
+_INTENT_CLEAN_RE = re.compile(r"[^a-zA-ZÀ-ÿ0-9\s]")
+# Mémo des prédictions pour les messages courts (les plus répétés : 'quiz', 'menu', ...)
+INTENT_MEMO_MAX_LEN = int(os.getenv("INTENT_MEMO_MAX_LEN", "64"))
+intent_memo = LRUTTLCache("intent", max_size=int(os.getenv("INTENT_MEMO_SIZE", "4096")))
+
+def clean_intent_text(text):
+    return _INTENT_CLEAN_RE.sub("", text.lower().strip())
+
+def predict_intents(texts):
+    """
+    Prédit l'intention de plusieurs messages en une seule transformation
+    sparse. Retourne une liste de (label, probabilité) dans l'ordre de `texts`.
+    """
+    cleaned = [clean_intent_text(t) for t in texts]
+    results = [None] * len(cleaned)
+    pending = {}
+    for i, text in enumerate(cleaned):
+        if len(text) <= INTENT_MEMO_MAX_LEN:
+            hit = intent_memo.get(text)
+            if hit is not None:
+                results[i] = hit
+                continue
+        # Les doublons du lot ne sont prédits qu'une fois
+        pending.setdefault(text, []).append(i)
+    if pending:
+        unique = list(pending)
+        if model_client is not None:
+            predictions = model_client.call('predict_intents', unique)
+        else:
+            predictions = predict_intents_with(vectorizer, intent_model, unique)
+        for text, prediction in zip(unique, predictions):
+            prediction = tuple(prediction)
+            if len(text) <= INTENT_MEMO_MAX_LEN:
+                intent_memo.set(text, prediction)
+            for i in pending[text]:
+                results[i] = prediction
+    return results
+
 def predict_intent(text):
-    cleaned = re.sub(r"[^a-zA-ZÀ-ÿ0-9\s]", "", text.lower().strip())
-    vect = vectorizer.transform([cleaned])
-    prediction = intent_model.predict(vect)[0]
-    return prediction
+    return predict_intents([text])[0][0]
 
 def start_learning_path(user_id, lang):
     # Le parcours commence toujours par le niveau débutant
@@ -168,42 +320,40 @@ def handle_learning_path(user_input, user_id, lang):
         'ar': ['مبتدئ', 'متوسط', 'متقدم']
     }
     lang_code = lang if lang in ['fr', 'en', 'ar'] else 'fr'
-    quiz_data = quiz_data_fr if lang == 'fr' else quiz_data_en if lang == 'en' else quiz_data_ar
+    bank = quiz_bank_for(lang)
     # Avancer dans les questions
     current_level = levels[session['learning_level']]
-    questions = quiz_data.get(current_level, [])
+    questions = bank.level(current_level)
     idx = session['learning_question_index']
     # Vérifie la réponse précédente si ce n'est pas la première fois
-    if idx > 0:
-        prev_question = questions[idx-1]
-        correct = False
-        options = prev_question.get('options') or {chr(65+i).lower(): opt for i, opt in enumerate(prev_question.get('choices', []))}
-        answer_value = prev_question['answer'].lower() if isinstance(prev_question['answer'], str) else prev_question['answer']
-        # Cherche la clé (lettre) correspondant à la bonne réponse
-        correct_key = None
-        for k, v in options.items():
-            if v.lower() == answer_value:
-                correct_key = k
-                break
-        user_answer = user_input.strip().lower()
-        correct = False
-        if user_answer == answer_value or user_answer == (correct_key or '').lower():
-            correct = True
+    if 0 < idx <= len(questions):
+        prev_question = bank.get(questions[idx-1])
+        correct = prev_question.grade(user_input)
+        if correct is None:
+            # Réponse invalide : même question, sans la compter comme une erreur (comme le quiz)
+            keys = ', '.join(prev_question.option_keys).upper()
+            if lang == 'fr':
+                return f"Réponse invalide. Merci de choisir parmi les options proposées : {keys} ou écrire la réponse complète."
+            elif lang == 'en':
+                return f"Invalid answer. Please choose from the available options: {keys} or write the full answer."
+            else:
+                return f"إجابة غير صالحة. يرجى اختيار أحد الحروف التالية: {keys} أو كتابة الإجابة كاملة."
+        record_review(user_id, lang, prev_question.id, correct)
+        answer = f"{prev_question.correct_key.upper()}) {prev_question.correct_text}"
         # Feedback immédiat
         if lang == 'fr':
-            feedback = "Bonne réponse ! ✅" if correct else f"Incorrect. ❌ La bonne réponse était : {correct_key.upper()}) {answer_value}"
+            feedback = "Bonne réponse ! ✅" if correct else f"Incorrect. ❌ La bonne réponse était : {answer}"
         elif lang == 'en':
-            feedback = "Correct! ✅" if correct else f"Incorrect. ❌ The correct answer was: {correct_key.upper()}) {answer_value}"
+            feedback = "Correct! ✅" if correct else f"Incorrect. ❌ The correct answer was: {answer}"
         else:
-            feedback = "إجابة صحيحة! ✅" if correct else f"إجابة خاطئة. ❌ الجواب الصحيح هو: {correct_key.upper()}) {answer_value}"
+            feedback = "إجابة صحيحة! ✅" if correct else f"إجابة خاطئة. ❌ الجواب الصحيح هو: {answer}"
     else:
         feedback = ''
     # Prochaine question
     if idx < len(questions):
-        question = questions[idx]
         session['learning_question_index'] += 1
         user_sessions[user_id] = session
-        q_text = format_quiz_question(question)
+        q_text = bank.get(questions[idx]).text
         if feedback:
             return f"{feedback}\n\n{q_text}"
         else:
@@ -235,165 +385,96 @@ def handle_learning_path(user_input, user_id, lang):
 
 
 def start_context(user_id, lang):
-    def extract_titles(contexts):
-        themes = []
-        for key, val in contexts.items():
-            if isinstance(val, dict):
-                title_fr = val.get('title', '')
-                title_en = val.get('title_en', '')
-                title_ar = val.get('title_ar', '')
-                themes.append({'key': key, 'fr': title_fr, 'en': title_en, 'ar': title_ar})
-            else:
-                themes.append({'key': key, 'fr': key, 'en': key, 'ar': key})
-        return themes
-    all_themes = extract_titles(context_data_extra)
-    if lang == 'fr':
-        msg = "Bienvenue dans le module Contexte !\nVoici la liste des thèmes disponibles dans le module :\n"
-        for t in all_themes:
-            titre = t['fr'] or t['key']
-            msg += f"- {titre}\n"
-        msg += "Donne-moi un thème ou tape 'menu' pour revenir."
-        return msg
-    elif lang == 'en':
-        msg = "Welcome to the Context module!\nHere is the list of available topics in the module:\n"
-        for t in all_themes:
-            titre = t['en'] or t['fr'] or t['key']
-            msg += f"- {titre}\n"
-        msg += "Give me a topic or type 'menu' to go back."
-        return msg
-    else:
-        msg = "مرحبا بك في وحدة السياق!\nهذه قائمة المواضيع المتوفرة في الوحدة:\n"
-        for t in all_themes:
-            titre = t['ar'] or t['fr'] or t['key']
-            msg += f"- {titre}\n"
-        msg += "أعطني موضوعًا أو اكتب 'menu' للرجوع."
-        return msg
+    # Menu formaté une seule fois par langue et par version du contenu
+    return content_registry.current().derived(
+        ('context_menu', lang), lambda snapshot: render_theme_menu(snapshot['context_extra'], lang)
+    )
+
+def context_sources(snapshot):
+    return [('main', snapshot['context_main']), ('extra', snapshot['context_extra'])]
+
+# Recherche classée quand l'index des thèmes ne trouve rien :
+# bm25 (défaut) ou recherche vectorielle TF-IDF : char | word (voir context_vectors)
+CONTEXT_RETRIEVAL = os.getenv("CHATBOT_CONTEXT_RETRIEVAL", "bm25").lower()
+# Score BM25 ou similarité cosinus selon le mode
+CONTEXT_SEARCH_MIN_SCORE = float(os.getenv(
+    "CONTEXT_SEARCH_MIN_SCORE", "0.05" if CONTEXT_RETRIEVAL in VECTOR_MODES else "1.5"
+))
+
+def build_context_search(snapshot):
+    if CONTEXT_RETRIEVAL in VECTOR_MODES:
+        return ContextVectors(context_sources(snapshot), normalize_text, CONTEXT_RETRIEVAL)
+    return ContextSearch(context_sources(snapshot), normalize_text)
+
+def build_theme_index(snapshot):
+    return ThemeIndex(context_sources(snapshot), normalize_text)
+
+# Index dérivés : construits une fois par instantané de contenu
+def get_theme_index():
+    return content_registry.current().derived('theme_index', build_theme_index)
 
-import unicodedata
+def get_context_search():
+    return content_registry.current().derived('context_search', build_context_search)
 
-def normalize_text(text):
-    # Supprime les accents et met en minuscule
-    return ''.join(c for c in unicodedata.normalize('NFD', text)
-                   if unicodedata.category(c) != 'Mn').lower()
+CONTEXT_MORE_COMMANDS = {'suite', 'la suite', 'plus', 'more', 'next', 'suivant', 'المزيد', 'zid', 'kmel'}
+
+def context_pages(snapshot, source, key, lang):
+    """Pages d'une entrée de contexte, découpées une fois par instantané et par langue."""
+    def build(snapshot):
+        context = snapshot['context_main' if source == 'main' else 'context_extra'].get(key)
+        return paginate(render_context(key, context, lang)) if context is not None else None
+    return snapshot.derived(('context_pages', source, key, lang), build)
+
+def show_context_page(user_id, snapshot, source, key, lang, index):
+    pages = context_pages(snapshot, source, key, lang)
+    if not pages or index >= len(pages):
+        return None
+    # La session ne garde que la référence du thème et le numéro de page
+    session = user_sessions[user_id]
+    session['context_source'] = source
+    session['context_key'] = key
+    session['context_page'] = index
+    return render_page(pages, index, lang)
 
 def handle_context(user_input, user_id, lang):
     if user_input.strip().lower() == 'menu':
         user_sessions[user_id]['state'] = 'main_menu'
         return process_input('', user_id)
-    
-    theme = normalize_text(user_input.strip())
-    context = None
-    source = None
-    # Recherche floue dans enriched_contexts_with_martyrs.json
-    for key, val in context_data_main.items():
-        key_norm = normalize_text(key)
-        title_norm = normalize_text(val.get('title', ''))
-        title_en_norm = normalize_text(val.get('title_en', ''))
-        if (
-            theme in key_norm or key_norm in theme or
-            (title_norm and theme in title_norm) or
-            (title_en_norm and theme in title_en_norm) or
-            key_norm.startswith(theme) or theme.startswith(key_norm) or
-            (title_norm and (theme in title_norm or title_norm in theme)) or
-            (title_en_norm and (theme in title_en_norm or title_en_norm in theme))
-        ):
-            context = val
-            source = 'main'
-            break
-    # Si rien trouvé, cherche dans contexts.json (toujours en recherche floue)
-    if not context:
-        for key, val in context_data_extra.items():
-            key_norm = normalize_text(key)
-            title_norm = normalize_text(val.get('title', '')) if isinstance(val, dict) else ''
-            if (
-                theme in key_norm or key_norm in theme or
-                (title_norm and theme in title_norm) or
-                key_norm.startswith(theme) or theme.startswith(key_norm) or
-                (title_norm and (theme in title_norm or title_norm in theme))
-            ):
-                context = val
-                source = 'extra'
-                break
-    if context:
-        # Affichage enrichi pour les contextes de type vocabulaire ou liste
-        title = context.get('title', key) if isinstance(context, dict) else key
-        # Cas 1 : vocabulaire (champ 'words' ou 'phrases')
-        vocab_key = None
-        for k in ['words', 'phrases', 'vocabulaire', 'expressions']:
-            if isinstance(context, dict) and k in context and isinstance(context[k], dict):
-                vocab_key = k
-                break
-        if vocab_key:
-            lines = []
-            for mot, trad in context[vocab_key].items():
-                if isinstance(trad, dict):
-                    if lang == 'fr':
-                        # Affiche la traduction anglaise pour chaque expression française
-                        en_val = trad.get('en', '-')
-                        if isinstance(en_val, list):
-                            en_val = ', '.join(str(x) for x in en_val)
-                        lines.append(f"{mot} : {en_val}")
-                    elif lang == 'en':
-                        # Affiche chaque expression anglaise suivie de la traduction française
-                        en_val = trad.get('en', '-')
-                        fr_val = trad.get('fr', '-')
-                        if isinstance(en_val, list):
-                            for eng in en_val:
-                                lines.append(f"{eng} : {fr_val}")
-                        else:
-                            lines.append(f"{en_val} : {fr_val}")
-                    else:
-                        # Pour l'arabe ou autre, fallback comportement précédent
-                        val = trad.get(lang, trad.get('fr') or trad.get('en') or trad.get('ar') or str(trad))
-                        if isinstance(val, list):
-                            val = ', '.join(str(x) for x in val)
-                        lines.append(f"{mot} : {val}")
-                elif isinstance(trad, list):
-                    lines.append(f"{mot} : {', '.join(str(x) for x in trad)}")
-                else:
-                    lines.append(f"{mot} : {trad}")
-            details = '\n'.join(lines)
-        # Cas 2 : dict contenant principalement des listes ou dicts
-        elif isinstance(context, dict):
-            # Si pas de history/summary, mais d'autres champs list/dict
-            details = context.get('history') or context.get('summary')
-            if not details:
-                # Cherche le premier champ list/dict non vide
-                details = None
-                for v in context.values():
-                    if isinstance(v, (list, dict)):
-                        if isinstance(v, list):
-                            details = '\n'.join(str(x) for x in v)
-                        elif isinstance(v, dict):
-                            # Si dict multilingue, afficher la langue courante
-                            lines = []
-                            for k2, v2 in v.items():
-                                if isinstance(v2, dict):
-                                    val = v2.get(lang, v2.get('fr') or v2.get('en') or v2.get('ar') or str(v2))
-                                    if isinstance(val, list):
-                                        val = ' | '.join(str(x) for x in val)
-                                    lines.append(f"{k2} : {val}")
-                                elif isinstance(v2, list):
-                                    lines.append(f"{k2} : {' | '.join(str(x) for x in v2)}")
-                                else:
-                                    lines.append(f"{k2} : {v2}")
-                            details = '\n'.join(lines)
-                        break
-            if not details:
-                # Fallback : premier champ texte
-                details = next((v for v in context.values() if isinstance(v, str)), str(context))
-        else:
-            details = str(context)
+    snapshot = content_registry.current()
+    session = user_sessions[user_id]
+    if normalize_command(user_input) in CONTEXT_MORE_COMMANDS and session.get('context_key'):
+        reply = show_context_page(
+            user_id, snapshot, session['context_source'], session['context_key'], lang,
+            session.get('context_page', 0) + 1,
+        )
+        if reply is not None:
+            return reply
         if lang == 'fr':
-            return f"{title} :\n{details}"
+            return "Il n'y a rien de plus sur ce thème. Tape un autre thème ou 'menu'."
         elif lang == 'en':
-            return f"{title} :\n{details}"
+            return "There is nothing more on this topic. Type another topic or 'menu'."
         else:
-            return f"{title} :\n{details}"
+            return "ما كاين والو زيادة على هذا الموضوع. اكتب موضوعا آخر أو 'menu'."
+
+    # Recherche dans l'index des thèmes (enriched_contexts_with_martyrs.json puis contexts.json)
+    match = get_theme_index().lookup(user_input.strip())
+    context = None
+    search_hits = []
+    if match:
+        source, key, context = match
+    else:
+        # Fautes de frappe, formulations libres : meilleur résultat (BM25 ou TF-IDF) s'il est assez pertinent
+        search_hits = get_context_search().search(user_input.strip(), k=5)
+        if search_hits and search_hits[0][0] >= CONTEXT_SEARCH_MIN_SCORE:
+            _, source, key, _ = search_hits[0]
+            context = snapshot['context_main' if source == 'main' else 'context_extra'][key]
+    if context:
+        # Réponse formatée et découpée une seule fois par (source, thème, langue) ; première page
+        return show_context_page(user_id, snapshot, source, key, lang, 0)
     else:
         # Fallback : matching avec les exemples de l'intent 'chat_context'
         chat_context_examples = []
-        for intent in intents_data.get('intents', []):
+        for intent in snapshot['intents'].get('intents', []):
             if intent.get('label') == 'chat_context':
                 chat_context_examples = intent.get('examples', [])
                 break
@@ -406,9 +487,12 @@ def handle_context(user_input, user_id, lang):
                 return "Of course! Give me a keyword or a specific topic (e.g. independence, history, war, etc.) and I'll tell you what I know."
             else:
                 return "بالطبع! أعطني كلمة مفتاحية أو موضوعا محددا (مثلا: الاستقلال، التاريخ، الحرب...) وسأخبرك بما أعرف."
-        # Si toujours rien trouvé, propose une liste de thèmes disponibles
-        available_themes = list(context_data_main.keys()) + list(context_data_extra.keys())
-        themes_display = ', '.join(sorted(set(available_themes))[:12]) + (', ...' if len(available_themes) > 12 else '')
+        # Si toujours rien trouvé, propose les thèmes les plus proches (ou une liste de thèmes disponibles)
+        if search_hits:
+            themes_display = ', '.join(title for _, _, _, title in search_hits)
+        else:
+            available_themes = list(snapshot['context_main'].keys()) + list(snapshot['context_extra'].keys())
+            themes_display = ', '.join(sorted(set(available_themes))[:12]) + (', ...' if len(available_themes) > 12 else '')
         if lang == 'fr':
             return f"Désolé, je n'ai pas trouvé de contexte pour le thème '{user_input}'.\nVoici quelques thèmes disponibles : {themes_display}"
         elif lang == 'en':
@@ -430,6 +514,21 @@ def handle_grammar_correction(user_input, user_id, lang):
         return process_input('', user_id)
     # Correction simple avec le modèle existant
     corrected = correct_grammar_with_model(user_input)
+    if corrected is None and grammar_model.failed():
+        # Échec de chargement : une reprise est peut-être programmée, mais pas dans « quelques instants »
+        if lang == 'fr':
+            return "Le correcteur est indisponible pour le moment. Tape 'menu' pour revenir. ⚠️"
+        elif lang == 'en':
+            return "The grammar corrector is unavailable right now. Type 'menu' to go back. ⚠️"
+        else:
+            return "المصحح غير متاح حاليا. اكتب 'menu' للرجوع. ⚠️"
+    if corrected is None:
+        if lang == 'fr':
+            return "Le correcteur est en cours de chargement, réessaie dans quelques instants. ⏳"
+        elif lang == 'en':
+            return "The grammar corrector is warming up, please try again in a moment. ⏳"
+        else:
+            return "المصحح قيد التحميل، أعد المحاولة بعد لحظات. ⏳"
     if lang == 'fr':
         return f"Phrase corrigée : {corrected}"
     elif lang == 'en':
@@ -507,11 +606,11 @@ def handle_logs(user_input, user_id, lang):
 import time
 
 def start_challenge(user_id, lang):
-    session = user_sessions.get(user_id, {})
+    session = user_sessions.get(user_id) or ChatSession()
     session['state'] = 'waiting_challenge_level'
     session['challenge_score'] = 0
     session['challenge_index'] = 0
-    session['challenge_questions'] = []
+    session['challenge_questions'] = ()
     session['challenge_start_time'] = None
     session['challenge_question_time'] = None
     user_sessions[user_id] = session
@@ -523,7 +622,7 @@ def start_challenge(user_id, lang):
         return "مرحبا بك في التحدي! اختر المستوى (مبتدئ، متوسط، متقدم):"
 
 def handle_challenge_level_selection(user_input, user_id):
-    session = user_sessions.get(user_id, {})
+    session = user_sessions.get(user_id) or ChatSession()
     lang = session.get('language', 'fr')
     level_map = {
         'fr': {'débutant': 'beginner', 'intermédiaire': 'intermediate', 'avancé': 'advanced'},
@@ -549,8 +648,8 @@ def handle_challenge_level_selection(user_input, user_id):
             else:
                 return "يرجى اختيار: مبتدئ، متوسط أو متقدم."
     # Charger les données de quiz selon la langue
-    quiz_data = quiz_data_fr if lang == 'fr' else quiz_data_en if lang == 'en' else quiz_data_ar
-    questions = quiz_data.get(level, [])
+    bank = quiz_bank_for(lang)
+    questions = bank.level(level)
     if not questions:
         if lang == 'fr':
             return "Aucune question disponible pour ce niveau."
@@ -558,16 +657,18 @@ def handle_challenge_level_selection(user_input, user_id):
             return "No questions available for this level."
         else:
             return "لا توجد أسئلة لهذا المستوى."
-    selected = random.sample(questions, min(5, len(questions)))
+    # Identifiants dans la banque, pas de copie des questions
+    selected = tuple(random.sample(questions, min(5, len(questions))))
     session['challenge_questions'] = selected
     session['challenge_index'] = 0
     session['challenge_score'] = 0
     session['challenge_level'] = level
     session['state'] = 'in_challenge'
-    session = user_sessions.get(user_id, {})
+    session = user_sessions.get(user_id) or ChatSession()
     lang = session.get('language', 'fr')
     idx = session.get('challenge_index', 0)
-    questions = session.get('challenge_questions', [])
+    bank = quiz_bank_for(lang)
+    questions = [q for q in map(bank.get, session.get('challenge_questions', ())) if q is not None]
     max_time_global = 30
     now = time.time()
     elapsed_global = now - session.get('challenge_start_time', now)
@@ -583,38 +684,26 @@ def handle_challenge_level_selection(user_input, user_id):
             return "لقد انتهى التحدي بالفعل. اكتب 'menu' للعودة إلى القائمة الرئيسية."
     current_q = questions[idx]
     # Vérification réponse
-    correct = False
-    answer_value = current_q['answer'].lower() if isinstance(current_q['answer'], str) else current_q['answer']
-    options = current_q.get('options') or {chr(65+i).lower(): opt for i, opt in enumerate(current_q.get('choices', []))}
-    correct_key = None
-    for k, v in options.items():
-        if v.lower() == answer_value:
-            correct_key = k
-            break
-    user_answer = user_input.strip().lower()
-    # Sécurisation de l'accès à la clé dans les options
-    if user_answer == answer_value or user_answer == (correct_key or '').lower():
-        correct = True
-    elif user_answer in options:
-        # Si la clé existe mais n'est pas la bonne réponse
-        correct = False
-    else:
-        # Réponse invalide (clé inexistante)
+    correct = current_q.grade(user_input)
+    answer = f"{current_q.correct_key.upper()}) {current_q.correct_text}"
+    if correct is None:
+        # Réponse invalide (ni une lettre ni le texte d'une option)
+        keys = ', '.join(current_q.option_keys).upper()
         if lang == 'fr':
-            return f"Réponse invalide. Merci de choisir parmi les options proposées : {', '.join(options.keys()).upper()}"
+            return f"Réponse invalide. Merci de choisir parmi les options proposées : {keys}"
         elif lang == 'en':
-            return f"Invalid answer. Please choose from the available options: {', '.join(options.keys()).upper()}"
+            return f"Invalid answer. Please choose from the available options: {keys}"
         else:
-            return f"إجابة غير صالحة. يرجى اختيار أحد الحروف التالية: {', '.join(options.keys()).upper()}"
+            return f"إجابة غير صالحة. يرجى اختيار أحد الحروف التالية: {keys}"
 
     # Feedback chrono
     if elapsed_global > max_time_global:
         if lang == 'fr':
-            feedback = f"⏰ Temps écoulé pour le challenge. La bonne réponse était : {correct_key.upper()}) {answer_value}\n"
+            feedback = f"⏰ Temps écoulé pour le challenge. La bonne réponse était : {answer}\n"
         elif lang == 'en':
-            feedback = f"⏰ Time's up for the challenge. The correct answer was: {correct_key.upper()}) {answer_value}\n"
+            feedback = f"⏰ Time's up for the challenge. The correct answer was: {answer}\n"
         else:
-            feedback = f"⏰ انتهى الوقت للتحدي. الجواب الصحيح هو: {correct_key.upper()}) {answer_value}\n"
+            feedback = f"⏰ انتهى الوقت للتحدي. الجواب الصحيح هو: {answer}\n"
         session['state'] = 'main_menu'
         user_sessions[user_id] = session
         if lang == 'fr':
@@ -625,11 +714,11 @@ def handle_challenge_level_selection(user_input, user_id):
             return f"فشل التحدي. النتيجة: 0/5\n{feedback}اكتب 'menu' للعودة إلى القائمة الرئيسية."
     elif not correct:
         if lang == 'fr':
-            feedback = f"Incorrect. ❌ La bonne réponse était : {correct_key.upper()}) {answer_value}\n"
+            feedback = f"Incorrect. ❌ La bonne réponse était : {answer}\n"
         elif lang == 'en':
-            feedback = f"Incorrect. ❌ The correct answer was: {correct_key.upper()}) {answer_value}\n"
+            feedback = f"Incorrect. ❌ The correct answer was: {answer}\n"
         else:
-            feedback = f"إجابة خاطئة. ❌ الجواب الصحيح هو: {correct_key.upper()}) {answer_value}\n"
+            feedback = f"إجابة خاطئة. ❌ الجواب الصحيح هو: {answer}\n"
         session['state'] = 'main_menu'
         user_sessions[user_id] = session
         if lang == 'fr':
@@ -639,7 +728,7 @@ def handle_challenge_level_selection(user_input, user_id):
         else:
             return f"فشل التحدي. النتيجة: 0/5\n{feedback}اكتب 'menu' للعودة إلى القائمة الرئيسية."
     options_str = ''
-    for k, v in options.items():
+    for k, v in current_q.options:
         options_str += f"{k.upper()}) {v}\n"
     if lang == 'fr':
         return f"⏱ Question : {q}\n{options_str}Réponds (lettre ou texte, 15s max) :"
@@ -648,28 +737,241 @@ def handle_challenge_level_selection(user_input, user_id):
     else:
         return f"⏱ السؤال: {q}\n{options_str}أجب (حرف أو نص، 15 ثانية كحد أقصى):"
 
+def record_review(user_id, lang, question_id, correct):
+    """Replanifie une question après une réponse (quiz, parcours, révision)."""
+    try:
+        state = review_store.load(user_id, lang)
+        state.record(question_id, correct)
+        review_store.save(user_id, lang, state)
+    except Exception as e:
+        # La révision ne doit jamais bloquer le quiz
+        logger.error(f"[REVIEW] Impossible d'enregistrer la réponse de {user_id} : {e}")
+
+def next_review_question(user_id, lang):
+    """Pose la prochaine question due (ou une nouvelle) ; message d'attente si rien n'est dû."""
+    session = user_sessions[user_id]
+    bank = quiz_bank_for(lang)
+    state = review_store.load(user_id, lang)
+    question_id = state.next_due(bank.order, lambda qid: bank.get(qid) is not None)
+    review_store.save(user_id, lang, state)
+    if question_id is None:
+        session.pop('review_question', None)
+        next_time = state.next_review_time()
+        minutes = max(1, round((next_time - time.time()) / 60)) if next_time else None
+        if lang == 'fr':
+            wait = f" Prochaine révision dans {minutes} min." if minutes else ""
+            return f"Rien à réviser pour l'instant.{wait} Tape 'menu' pour revenir."
+        elif lang == 'en':
+            wait = f" Next review in {minutes} min." if minutes else ""
+            return f"Nothing to review right now.{wait} Type 'menu' to go back."
+        else:
+            wait = f" المراجعة القادمة بعد {minutes} دقيقة." if minutes else ""
+            return f"لا شيء للمراجعة الآن.{wait} اكتب 'menu' للرجوع."
+    session['review_question'] = question_id
+    return bank.get(question_id).text
+
 def start_review(user_id, lang):
     if lang == 'fr':
-        return "Bienvenue dans la révision ! Tape un sujet ou 'menu' pour revenir."
+        intro = "Bienvenue dans la révision ! Les questions reviennent selon tes réponses. Tape 'menu' pour revenir."
     elif lang == 'en':
-        return "Welcome to the review! Type a topic or 'menu' to go back."
+        intro = "Welcome to the review! Questions come back based on your answers. Type 'menu' to go back."
     else:
-        return "مرحبا بك في المراجعة! اكتب موضوعًا أو 'menu' للرجوع."
+        intro = "مرحبا بك في المراجعة! تعود الأسئلة حسب إجاباتك. اكتب 'menu' للرجوع."
+    return f"{intro}\n\n{next_review_question(user_id, lang)}"
 
 def handle_review(user_input, user_id, lang):
+    session = user_sessions[user_id]
     if user_input.strip().lower() == 'menu':
-        user_sessions[user_id]['state'] = 'main_menu'
+        session['state'] = 'main_menu'
+        session.pop('review_question', None)
         return process_input('', user_id)
+    question = quiz_bank_for(lang).get(session.get('review_question'))
+    if question is None:
+        # Rien n'était dû (ou la question a disparu du contenu) : on réessaie
+        return next_review_question(user_id, lang)
+    correct = question.grade(user_input)
+    if correct is None:
+        keys = ', '.join(question.option_keys).upper()
+        if lang == 'fr':
+            return f"Réponse invalide. Merci de choisir parmi les options proposées : {keys}"
+        elif lang == 'en':
+            return f"Invalid answer. Please choose from the available options: {keys}"
+        else:
+            return f"إجابة غير صالحة. يرجى اختيار أحد الحروف التالية: {keys}"
+    record_review(user_id, lang, question.id, correct)
+    answer = f"{question.correct_key.upper()}) {question.correct_text}"
     if lang == 'fr':
-        return "(Démo) Révision : {}".format(user_input)
+        feedback = "Bonne réponse ! ✅" if correct else f"Incorrect. ❌ La bonne réponse était : {answer}"
     elif lang == 'en':
-        return "(Demo) Review: {}".format(user_input)
+        feedback = "Correct! ✅" if correct else f"Incorrect. ❌ The correct answer was: {answer}"
     else:
-        return "(عرض) المراجعة: {}".format(user_input)
+        feedback = "إجابة صحيحة! ✅" if correct else f"إجابة خاطئة. ❌ الجواب الصحيح هو: {answer}"
+    return f"{feedback}\n\n{next_review_question(user_id, lang)}"
+
+# Index des recettes (ingrédients et noms), construit une fois par instantané de contenu
+def build_recipe_index(snapshot):
+    return RecipeIndex(snapshot['recettes'], normalize_text)
+
+def get_recipe_index():
+    return content_registry.current().derived('recipe_index', build_recipe_index)
+RECIPE_NEXT_COMMANDS = {'suivant', 'suite', 'etape suivante', 'next', 'next step', 'التالي', 'jay', 'zid'}
+# Nombre maximal de recettes proposées pour une recherche par ingrédients
+RECIPE_MAX_SUGGESTIONS = 10
+
+def start_recipes(user_id, lang):
+    return render_recipe_list(get_recipe_index(), lang)
+
+def select_recipe(user_id, recipe_id, lang):
+    session = user_sessions[user_id]
+    # La session ne garde que la clé stable de la recette (voir recipes) et l'étape courante
+    session['recipe_id'] = get_recipe_index().key(recipe_id)
+    session['recipe_step'] = -1
+    return render_recipe(get_recipe_index().get(recipe_id), lang)
+
+def handle_recipe(user_input, user_id, lang):
+    session = user_sessions[user_id]
+    recipe_index = get_recipe_index()
+    command = normalize_command(user_input)
+    if command == 'menu':
+        session['state'] = 'main_menu'
+        return process_input('', user_id)
+    if MENU_COMMANDS.get(command) == 'recipes':
+        return start_recipes(user_id, lang)
+    # Après un rechargement du contenu, la recette peut avoir changé ou disparu : clé introuvable
+    current = recipe_index.find_by_key(session.get('recipe_id'))
+    if command in RECIPE_NEXT_COMMANDS and current is not None:
+        recipe = recipe_index.get(current)
+        step = session.get('recipe_step', -1) + 1
+        if step >= step_count(recipe, lang):
+            if lang == 'fr':
+                return "La recette est terminée. Tape une autre recette ou 'menu'."
+            elif lang == 'en':
+                return "The recipe is finished. Type another recipe or 'menu'."
+            else:
+                return "الوصفة كملت. اكتب وصفة أخرى أو 'menu'."
+        session['recipe_step'] = step
+        return render_step(recipe, step, lang)
+    # Plusieurs ingrédients reconnus : recherche par ingrédients, sinon par nom
+    name_match = recipe_index.find_by_name(user_input)
+    terms, matches = recipe_index.find_by_ingredients(user_input)
+    if terms and (len(terms) > 1 or name_match is None):
+        if len(matches) == 1:
+            return select_recipe(user_id, matches[0], lang)
+        if matches:
+            names = '\n'.join(f"- {recipe_index.get(i)['nom']}" for i in matches[:RECIPE_MAX_SUGGESTIONS])
+            if lang == 'fr':
+                return f"Recettes avec ces ingrédients :\n{names}\nTape le nom de celle que tu veux."
+            elif lang == 'en':
+                return f"Recipes with these ingredients:\n{names}\nType the name of the one you want."
+            else:
+                return f"وصفات بهذه المكونات:\n{names}\nاكتب اسم الوصفة اللي تحب."
+    # Aucune recette avec ces ingrédients : le nom reconnu reste valable
+    if name_match is not None:
+        return select_recipe(user_id, name_match, lang)
+    if lang == 'fr':
+        return "Je n'ai pas trouvé de recette correspondante. Tape 'recettes' pour voir la liste ou 'menu' pour revenir."
+    elif lang == 'en':
+        return "I couldn't find a matching recipe. Type 'recipes' to see the list or 'menu' to go back."
+    else:
+        return "ما لقيتش وصفة مناسبة. اكتب 'وصفات' باش تشوف القائمة أو 'menu' للرجوع."
+
+# Table de correspondance multilingue pour chaque choix du menu principal
+MENU_CHOICES = {
+    'quiz':      ['1', 'quiz', 'اختبار', 'كويز', 'je veux un quiz', 'bghit quiz', 'i want a quiz'],
+    'learning':  ['2', 'learning path', 'parcours', 'مسار التعلم', 'parcours d\'apprentissage', 'مسار', 'i want to learn', 'je veux apprendre'],
+    'context':   ['3', 'context', 'سياق', 'contexte', 'contextes'],
+    'grammar':   ['4', 'grammar', 'correction grammaticale', 'تصحيح القواعد', 'correct grammar', 'corrige', 'corriger'],
+    'progress':  ['5', 'progress', 'progression', 'progrès', 'تقدم', 'statistiques', 'stats'],
+    'logs':      ['6', 'logs', 'سجلات', 'journal'],
+    'challenge': ['7', 'challenge', 'تحدي', 'défi'],
+    'review':    ['8', 'review', 'مراجعة', 'révision'],
+    'exit':      ['9', 'exit', 'خروج', 'quitter'],
+    'recipes':   ['10', 'recettes', 'recette', 'recipes', 'recipe', 'وصفات', 'وصفة', 'bghit recette']
+}
+
+# Intentions du classifieur qui correspondent à une action du menu
+MENU_INTENT_ACTIONS = {
+    'launch_quiz': 'quiz',
+    'chat_context': 'context',
+    'correct_sentence': 'grammar',
+    'get_progress': 'progress',
+    'start_challenge': 'challenge',
+    'exit_bot': 'exit',
+    'ask_recipe': 'recipes',
+}
+# Probabilité minimale pour accepter l'intention prédite comme choix du menu
+MENU_INTENT_THRESHOLD = float(os.getenv("MENU_INTENT_THRESHOLD", "0.5"))
+
+def normalize_command(text):
+    # Accents, tashkeel et chiffres arabizi (« n9ra ») repliés comme dans les alias
+    return ' '.join(normalize_darija(text.strip()).rstrip('.!?؟').split())
+
+# Index construit une seule fois : alias normalisé -> action
+MENU_COMMANDS = {
+    normalize_command(alias): action
+    for action, aliases in MENU_CHOICES.items()
+    for alias in aliases
+}
+
+def resolve_menu_choice(user_input):
+    """Retourne l'action du menu correspondant à la saisie, ou None."""
+    command = normalize_command(user_input)
+    if not command:
+        return None
+    action = MENU_COMMANDS.get(command)
+    if action:
+        return action
+    try:
+        # Le classifieur a été entraîné sur le texte accentué : on lui passe la saisie brute
+        label, proba = predict_intents([' '.join(user_input.strip().lower().split())])[0]
+    except Exception as e:
+        logger.error(f"[CHATBOT] Échec de la prédiction d'intention : {e}")
+        return None
+    action = MENU_INTENT_ACTIONS.get(label)
+    if action and (proba is None or proba >= MENU_INTENT_THRESHOLD):
+        logger.info(f"[CHATBOT] Choix du menu déduit de l'intention '{label}' (p={proba})")
+        return action
+    return None
+
+# Index préparés avant la publication d'un nouvel instantané, hors du chemin des requêtes
+def warm_content(snapshot):
+    snapshot.derived('theme_index', build_theme_index)
+    snapshot.derived('context_search', build_context_search)
+    snapshot.derived('recipe_index', build_recipe_index)
+    for lang in ('fr', 'en', 'ar'):
+        name = quiz_content_name(lang)
+        snapshot.derived(validated_key(name), lambda snapshot: build_quiz_bank(snapshot, name))
+
+content_registry.warmers.append(warm_content)
+warm_content(content_registry.current())
+
+def start_content_watcher():
+    content_registry.start_watcher()
+
+def stop_content_watcher():
+    content_registry.stop_watcher()
+
+def close_sessions():
+    # Après l'arrêt du pool : plus aucun message en cours, le dernier instantané est complet
+    user_sessions.close()
+    review_store.close()
+
+def reload_content(force=False):
+    return content_registry.reload(force=force)
+
+def content_status():
+    return content_registry.status()
 
 def process_input(user_input, user_id="default"):
+    # Un message est traité de bout en bout avec la même version du contenu,
+    # et sa session n'est lue et écrite qu'une fois dans le store, sous le
+    # verrou de l'utilisateur (un seul message à la fois par utilisateur)
+    with user_locks.hold(user_id), content_registry.pin(), user_sessions.transaction(user_id):
+        return _process_input(user_input, user_id)
+
+def _process_input(user_input, user_id="default"):
     global user_sessions
-    session = user_sessions.get(user_id, {'state': 'inactive', 'language': None})
+    session = user_sessions.get(user_id) or ChatSession(state='inactive')
     user_input_clean = user_input.strip().lower()
     logger.info(f"[CHATBOT] user_id={user_id} | state={session['state']} | input='{user_input_clean}'")
 
@@ -716,6 +1018,7 @@ Bienvenue sur Fennlingo ! Que veux-tu faire ?
 7. Challenge
 8. Révision
 9. Quitter
+10. Recettes
 (Tu peux répondre par un numéro ou une phrase, ex : 'je veux un quiz')
 """
         elif lang == 'en':
@@ -730,6 +1033,7 @@ Welcome to Fennlingo! What do you want to do?
 7. Challenge
 8. Review
 9. Exit
+10. Recipes
 (You can reply with a number or a sentence, e.g.: 'I want a quiz')
 """
         else:
@@ -744,6 +1048,7 @@ Welcome to Fennlingo! What do you want to do?
 7. التحدي
 8. مراجعة
 9. الخروج
+10. وصفات
 (تقدر تجاوب برقم أو جملة، مثال: 'حاب كويز')
 """
         return menu
@@ -752,23 +1057,8 @@ Welcome to Fennlingo! What do you want to do?
     elif session['state'] == 'main_menu':
         logger.info(f"[CHATBOT] user_id={user_id} | Etat MAIN_MENU")
         lang = session.get('language', 'fr')
-        # Table de correspondance multilingue pour chaque choix
-        choices = {
-            'quiz':      ['1', 'quiz', 'اختبار', 'كويز', 'je veux un quiz', 'bghit quiz', 'i want a quiz'],
-            'learning':  ['2', 'learning path', 'parcours', 'مسار التعلم', 'parcours d\'apprentissage', 'مسار', 'i want to learn', 'je veux apprendre'],
-            'context':   ['3', 'context', 'سياق', 'contexte', 'contextes'],
-            'grammar':   ['4', 'grammar', 'correction grammaticale', 'تصحيح القواعد', 'correct grammar', 'corrige', 'corriger'],
-            'progress':  ['5', 'progress', 'progression', 'progrès', 'تقدم', 'statistiques', 'stats'],
-            'logs':      ['6', 'logs', 'سجلات', 'journal'],
-            'challenge': ['7', 'challenge', 'تحدي', 'défi'],
-            'review':    ['8', 'review', 'مراجعة', 'révision'],
-            'exit':      ['9', 'exit', 'خروج', 'quitter']
-        }
-        selected = None
-        for key, values in choices.items():
-            if user_input_clean in values:
-                selected = key
-                break
+        # Alias exact (table précompilée) puis classifieur d'intentions
+        selected = resolve_menu_choice(user_input_clean)
         if selected == 'quiz':
             session['state'] = 'in_quiz'
             user_sessions[user_id] = session
@@ -801,6 +1091,13 @@ Welcome to Fennlingo! What do you want to do?
             session['state'] = 'in_review'
             user_sessions[user_id] = session
             return start_review(user_id, lang)
+        elif selected == 'recipes':
+            session['state'] = 'in_recipe'
+            user_sessions[user_id] = session
+            # « recette couscous » ou « avec semoule et pois chiches » : réponse directe
+            if normalize_command(user_input_clean) in MENU_COMMANDS:
+                return start_recipes(user_id, lang)
+            return handle_recipe(user_input, user_id, lang)
         elif selected == 'exit':
             session['state'] = 'inactive'
             user_sessions[user_id] = session
@@ -824,6 +1121,7 @@ Bienvenue sur Fennlingo ! Que veux-tu faire ?
 7. Challenge
 8. Révision
 9. Quitter
+10. Recettes
 (Tu peux répondre par un numéro ou une phrase, ex : 'je veux un quiz')
 """
             elif lang == 'en':
@@ -838,6 +1136,7 @@ Welcome to Fennlingo! What do you want to do?
 7. Challenge
 8. Review
 9. Exit
+10. Recipes
 (You can reply with a number or a sentence, e.g.: 'I want a quiz')
 """
             else:
@@ -852,6 +1151,7 @@ Welcome to Fennlingo! What do you want to do?
 7. التحدي
 8. مراجعة
 9. الخروج
+10. وصفات
 (تقدر تجاوب برقم أو جملة، مثال: 'حاب كويز')
 """
             return menu
@@ -882,6 +1182,9 @@ Welcome to Fennlingo! What do you want to do?
     elif session['state'] == 'in_review':
         logger.info(f"[CHATBOT] user_id={user_id} | Etat IN_REVIEW")
         return handle_review(user_input, user_id, session.get('language', 'fr'))
+    elif session['state'] == 'in_recipe':
+        logger.info(f"[CHATBOT] user_id={user_id} | Etat IN_RECIPE")
+        return handle_recipe(user_input, user_id, session.get('language', 'fr'))
 
     else:
         logger.error(f"[CHATBOT] user_id={user_id} | Etat inconnu: {session['state']}")
@@ -889,20 +1192,6 @@ Welcome to Fennlingo! What do you want to do?
         user_sessions[user_id] = session
         return "Erreur d'état, veuillez recommencer en saluant Fennlingo."
 
-def format_quiz_question(question_data):
-    """Formats a quiz question for display, supports both 'options' dict and 'choices' list."""
-    question_text = question_data['question']
-    if 'options' in question_data and isinstance(question_data['options'], dict):
-        options = question_data['options']
-        options_str = "\n".join([f"{key.upper()}) {value}" for key, value in options.items()])
-    elif 'choices' in question_data and isinstance(question_data['choices'], list):
-        options = {chr(65+i).lower(): opt for i, opt in enumerate(question_data['choices'])}
-        options_str = "\n".join([f"{key.upper()}) {value}" for key, value in options.items()])
-        question_data['options'] = options
-    else:
-        options_str = ""
-    return f"{question_text}\n{options_str}"
-
 def start_quiz(user_id):
     """Demande le niveau à l'utilisateur avant de lancer le quiz."""
     session = user_sessions.get(user_id)
@@ -922,7 +1211,7 @@ def handle_quiz_answer(user_input, user_id):
     """Gère la réponse de l'utilisateur dans le quiz, avec gestion du niveau."""
     session = user_sessions.get(user_id)
     if not session:
-        session = {'state': 'main_menu'}
+        session = ChatSession(state='main_menu')
         user_sessions[user_id] = session
         return "Erreur de session. Retour au menu principal."
     lang = session.get('language', 'fr')
@@ -951,65 +1240,29 @@ def handle_quiz_answer(user_input, user_id):
         user_sessions[user_id] = session
         return ask_quiz_question(user_id)
     # Gestion de la réponse à la question
-    if session.get('state') == 'in_quiz_level' and 'current_quiz' in session:
-        options = session['current_quiz']['options']
-        answer_field = session['current_quiz']['answer']
-        # Détecte dynamiquement la bonne clé d'option
-        if answer_field in options:
-            correct_answer_key = answer_field
-            correct_answer_value = options[correct_answer_key]
-        else:
-            # Cherche la clé dont la valeur correspond à answer_field (insensible à la casse ou commence par la même lettre)
-            correct_answer_key = None
-            correct_answer_value = None
-            for k, v in options.items():
-                if answer_field.strip().lower() == v.strip().lower() or answer_field.strip().lower() == v.strip().lower()[0]:
-                    correct_answer_key = k
-                    correct_answer_value = v
-                    break
-            if correct_answer_key is None:
-                # Si toujours pas trouvé, tente la première lettre de chaque option
-                for k, v in options.items():
-                    if answer_field.strip().lower() == k:
-                        correct_answer_key = k
-                        correct_answer_value = v
-                        break
-            if correct_answer_key is None:
-                logger.error(f"[QUIZ] Incohérence: answer '{answer_field}' non trouvée dans les options {list(options.values())}")
-                if lang == 'fr':
-                    return f"Erreur interne : la réponse du quiz n'est pas valide. Merci de signaler ce bug."
-                elif lang == 'en':
-                    return f"Internal error: quiz answer is not valid. Please report this bug."
-                else:
-                    return f"خطأ داخلي: إجابة الكويز غير صالحة. يرجى الإبلاغ عن هذا الخطأ."
-        user_answer = user_input.strip().lower()
-        # Vérifie si la réponse utilisateur correspond à la lettre OU au texte de l'option
-        is_correct = (
-            user_answer == correct_answer_key.lower() or
-            user_answer == correct_answer_value.strip().lower()
-        )
+    current_quiz = current_quiz_question(session) if session.get('state') == 'in_quiz_level' else None
+    if current_quiz is not None:
+        # Réponse acceptée : lettre ou texte de la bonne option (précalculés par quiz_bank)
+        is_correct = current_quiz.grade(user_input)
+        if is_correct is not None:
+            record_review(user_id, lang, current_quiz.id, is_correct)
         if is_correct:
             feedback = "Bonne réponse ! ✅" if lang == 'fr' else ("Correct! ✅" if lang == 'en' else "إجابة صحيحة! ✅")
-        elif user_answer in options:
-            # Mauvaise réponse mais la clé existe
-            msg = f"Incorrect. ❌ La bonne réponse était : {correct_answer_key.upper()}) {correct_answer_value}" if lang == 'fr' \
-                else (f"Incorrect. ❌ The correct answer was: {correct_answer_key.upper()}) {correct_answer_value}" if lang == 'en' \
-                else f"إجابة خاطئة. ❌ الجواب الصحيح هو: {correct_answer_key.upper()}) {correct_answer_value}")
-            feedback = msg
-        elif user_answer in [v.strip().lower() for v in options.values()]:
-            # Mauvaise réponse mais l'utilisateur a écrit le texte d'une mauvaise option
-            msg = f"Incorrect. ❌ La bonne réponse était : {correct_answer_key.upper()}) {correct_answer_value}" if lang == 'fr' \
-                else (f"Incorrect. ❌ The correct answer was: {correct_answer_key.upper()}) {correct_answer_value}" if lang == 'en' \
-                else f"إجابة خاطئة. ❌ الجواب الصحيح هو: {correct_answer_key.upper()}) {correct_answer_value}")
-            feedback = msg
+        elif is_correct is False:
+            # Mauvaise réponse : lettre ou texte d'une autre option
+            answer = f"{current_quiz.correct_key.upper()}) {current_quiz.correct_text}"
+            feedback = f"Incorrect. ❌ La bonne réponse était : {answer}" if lang == 'fr' \
+                else (f"Incorrect. ❌ The correct answer was: {answer}" if lang == 'en' \
+                else f"إجابة خاطئة. ❌ الجواب الصحيح هو: {answer}")
         else:
             # Réponse invalide (clé inexistante)
+            keys = ', '.join(current_quiz.option_keys).upper()
             if lang == 'fr':
-                return f"Réponse invalide. Merci de choisir parmi les options proposées : {', '.join(options.keys()).upper()} ou écrire la réponse complète."
+                return f"Réponse invalide. Merci de choisir parmi les options proposées : {keys} ou écrire la réponse complète."
             elif lang == 'en':
-                return f"Invalid answer. Please choose from the available options: {', '.join(options.keys()).upper()} or write the full answer."
+                return f"Invalid answer. Please choose from the available options: {keys} or write the full answer."
             else:
-                return f"إجابة غير صالحة. يرجى اختيار أحد الحروف التالية: {', '.join(options.keys()).upper()} أو كتابة الإجابة كاملة."
+                return f"إجابة غير صالحة. يرجى اختيار أحد الحروف التالية: {keys} أو كتابة الإجابة كاملة."
         # Nouvelle question
         return f"{feedback}\n\n---\n\n{ask_quiz_question(user_id)}"
     # Si problème
@@ -0,0 +1,246 @@
+"""
+Registre du contenu du chatbot (quiz, contextes, recettes, traductions, intentions).
+
+Le contenu est servi par instantanés immuables : un rechargement (surveillance
+du dossier de données ou appel admin) relit les fichiers modifiés, les valide,
+prépare les index dérivés puis remplace l'instantané courant en une seule
+affectation. Un fichier invalide annule tout le rechargement : l'ancien
+instantané reste en service.
+
+Au démarrage, il n'y a pas d'ancienne version : un fichier dont seules
+quelques entrées sont fautives (PartialContentError) est gardé tel quel, et
+les index dérivés écartent ces entrées.
+
+process_input épingle l'instantané courant pour toute la durée du message
+(pin()) : une requête en cours ne voit jamais deux versions du contenu.
+"""
+import os
+import json
+import time
+import threading
+import contextvars
+import logging
+from types import MappingProxyType
+from contextlib import contextmanager
+
+# Initialisation du logger
+logger = logging.getLogger(__name__)
+
+# Intervalle (secondes) entre deux vérifications du dossier de données ; 0 = pas de surveillance
+CONTENT_WATCH_INTERVAL = float(os.getenv("CONTENT_WATCH_INTERVAL", "2"))
+
+
+class ContentError(ValueError):
+    pass
+
+
+class PartialContentError(ContentError):
+    """Entrées mal formées dans un fichier par ailleurs utilisable."""
+
+
+def validated_key(name):
+    """Clé de ContentSnapshot.derived sous laquelle est gardé le résultat du validateur de `name`."""
+    return ('validated', name)
+
+
+def validate_contexts(data):
+    if not isinstance(data, dict):
+        raise ContentError("un dict clé -> contexte est attendu")
+
+
+def validate_recipes(data):
+    if not isinstance(data, dict):
+        raise ContentError("un dict catégorie -> recettes est attendu")
+    for category, recipes in data.items():
+        if not isinstance(recipes, list):
+            raise ContentError(f"catégorie '{category}' : liste de recettes attendue")
+        for i, recipe in enumerate(recipes):
+            if not isinstance(recipe, dict) or not recipe.get('nom') or not isinstance(recipe.get('etapes'), list):
+                raise ContentError(f"catégorie '{category}', recette {i} : champs 'nom' et 'etapes' requis")
+
+
+def validate_intents(data):
+    if not isinstance(data, dict) or not isinstance(data.get('intents'), list):
+        raise ContentError("un dict avec une liste 'intents' est attendu")
+
+
+def validate_dict(data):
+    if not isinstance(data, dict):
+        raise ContentError("un dict est attendu")
+
+
+class ContentSnapshot:
+    """Une version du contenu. Ni les données ni les index ne sont modifiés après publication."""
+
+    def __init__(self, version, data, signature, derived=None):
+        self.version = version
+        self.data = MappingProxyType(dict(data))
+        self.signature = signature
+        self.loaded_at = time.time()
+        self._derived = dict(derived or {})
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def derived(self, key, build):
+        """Valeur calculée une fois par instantané (index, réponses formatées, ...)."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+            return self._derived[key]
+
+
+class ContentRegistry:
+    """
+    files : {nom: fichier} relatif à data_dir ; validators : {nom: fonction}
+    levant ContentError ; warmers : fonctions(snapshot) appelées avant la
+    publication pour construire les index hors du chemin des requêtes.
+
+    Ce que retourne un validateur (s'il compile le fichier au passage) est
+    gardé comme valeur dérivée validated_key(nom) de l'instantané, et repris
+    tel quel par les versions suivantes tant que le fichier ne change pas.
+    """
+
+    def __init__(self, data_dir, files, validators=None, warmers=(), check_interval=CONTENT_WATCH_INTERVAL):
+        self.data_dir = data_dir
+        self.files = dict(files)
+        self.validators = dict(validators or {})
+        self.warmers = list(warmers)
+        self.check_interval = check_interval
+        self.last_errors = {}
+        self._rejected_signature = None
+        self._reload_lock = threading.Lock()
+        self._pinned = contextvars.ContextVar(f"content_snapshot_{id(self)}", default=None)
+        self._stop = threading.Event()
+        self._watcher = None
+        self._snapshot = self._initial_snapshot()
+
+    def _signature(self, filename):
+        try:
+            stat = os.stat(os.path.join(self.data_dir, filename))
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _parse(self, name):
+        filename = self.files[name]
+        with open(os.path.join(self.data_dir, filename), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        validator = self.validators.get(name)
+        result = None
+        if validator is not None:
+            try:
+                result = validator(data)
+            except PartialContentError as e:
+                e.data = data
+                raise
+        return data, result
+
+    def _initial_snapshot(self):
+        # Au démarrage un fichier illisible ne bloque pas le bot : contenu vide, comme avant
+        data, signature, derived = {}, {}, {}
+        for name, filename in self.files.items():
+            signature[name] = self._signature(filename)
+            try:
+                data[name], result = self._parse(name)
+                if result is not None:
+                    derived[validated_key(name)] = result
+            except PartialContentError as e:
+                logger.error(f"Entrées ignorées dans {filename} : {str(e)}")
+                self.last_errors[name] = str(e)
+                data[name] = e.data
+            except Exception as e:
+                logger.error(f"Erreur lors du chargement de {filename} : {str(e)}")
+                self.last_errors[name] = str(e)
+                data[name] = {}
+        return ContentSnapshot(1, data, signature, derived)
+
+    def current(self):
+        """Instantané épinglé par la requête en cours, sinon le plus récent."""
+        pinned = self._pinned.get()
+        return pinned if pinned is not None else self._snapshot
+
+    @contextmanager
+    def pin(self):
+        # Réentrant : les appels imbriqués (process_input récursif) gardent le même instantané
+        pinned = self._pinned.get()
+        if pinned is not None:
+            yield pinned
+            return
+        token = self._pinned.set(self._snapshot)
+        try:
+            yield self._snapshot
+        finally:
+            self._pinned.reset(token)
+
+    def reload(self, force=False):
+        """
+        Relit les fichiers modifiés (tous si force) et publie un nouvel
+        instantané s'ils sont tous valides. Retourne un rapport.
+        """
+        with self._reload_lock:
+            old = self._snapshot
+            signature = {name: self._signature(filename) for name, filename in self.files.items()}
+            changed = [name for name in self.files if force or signature[name] != old.signature.get(name)]
+            if not changed or (not force and signature == self._rejected_signature):
+                # Rien de nouveau, ou fichiers déjà refusés tels quels
+                return {"version": old.version, "changed": [], "errors": dict(self.last_errors)}
+            data, errors = dict(old.data), {}
+            # Résultats des validateurs des fichiers inchangés : repris de l'ancienne version
+            derived = {
+                validated_key(name): old._derived[validated_key(name)]
+                for name in self.files if name not in changed and validated_key(name) in old._derived
+            }
+            for name in changed:
+                try:
+                    data[name], result = self._parse(name)
+                    if result is not None:
+                        derived[validated_key(name)] = result
+                except Exception as e:
+                    errors[name] = str(e)
+            if not errors:
+                snapshot = ContentSnapshot(old.version + 1, data, signature, derived)
+                try:
+                    for warm in self.warmers:
+                        warm(snapshot)
+                except Exception as e:
+                    errors["warmup"] = str(e)
+            self.last_errors = errors
+            if errors:
+                self._rejected_signature = signature
+                logger.error(f"[CONTENT] Rechargement refusé, version {old.version} conservée : {errors}")
+                return {"version": old.version, "changed": changed, "errors": errors}
+            self._snapshot = snapshot
+            logger.info(f"[CONTENT] Version {snapshot.version} publiée ({', '.join(changed)})")
+            return {"version": snapshot.version, "changed": changed, "errors": {}}
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"[CONTENT] Erreur de surveillance : {e}")
+
+    def start_watcher(self):
+        if self.check_interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="content-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def status(self):
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "loaded_at": snapshot.loaded_at,
+            "files": dict(self.files),
+            "last_errors": dict(self.last_errors),
+        }
@@ -0,0 +1,94 @@
+import re
+from collections import defaultdict
+
+# Mots trop fréquents pour départager des thèmes (fr/en)
+STOP_WORDS = {
+    'de', 'la', 'le', 'les', 'des', 'du', 'et', 'en', 'un', 'une', 'au', 'aux',
+    'the', 'of', 'and', 'in', 'a', 'an', 'to', 'on',
+}
+MIN_PREFIX_LEN = 3
+
+_TOKEN_RE = re.compile(r"[^\w]+|_")
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.split(text) if len(t) > 1 and t not in STOP_WORDS]
+
+
+class ThemeIndex:
+    """
+    Index des thèmes de contexte construit une seule fois au chargement.
+
+    Chaque entrée est indexée par sa clé et ses titres (fr/en/ar) normalisés :
+    correspondance exacte, postings par token et par préfixe de token.
+    lookup() coûte donc de l'ordre de la longueur de la requête, et le meilleur
+    résultat est déterministe (score, puis ordre des sources et du fichier).
+    """
+
+    def __init__(self, sources, normalize):
+        # sources : liste de (nom_source, dict) par ordre de priorité
+        self.normalize = normalize
+        self.entries = []
+        self._exact = {}
+        self._tokens = defaultdict(set)
+        self._prefixes = defaultdict(set)
+        self._name_tokens = []
+        for source, data in sources:
+            for key, value in data.items():
+                self._add(source, key, value)
+
+    def _names(self, key, value):
+        names = [key, key.replace('_', ' ')]
+        if isinstance(value, dict):
+            for field in ('title', 'title_en', 'title_ar'):
+                title = value.get(field)
+                if isinstance(title, str) and title:
+                    names.append(title)
+        return names
+
+    def _add(self, source, key, value):
+        entry_id = len(self.entries)
+        self.entries.append((source, key, value))
+        token_sets = []
+        for name in self._names(key, value):
+            norm = ' '.join(self.normalize(name).split())
+            if not norm:
+                continue
+            self._exact.setdefault(norm, entry_id)
+            tokens = tokenize(norm)
+            if tokens:
+                token_sets.append(frozenset(tokens))
+            for token in tokens:
+                self._tokens[token].add(entry_id)
+                for size in range(MIN_PREFIX_LEN, len(token)):
+                    self._prefixes[token[:size]].add(entry_id)
+        self._name_tokens.append(token_sets)
+
+    def lookup(self, query):
+        """Retourne (source, clé, valeur) du meilleur thème pour `query`, ou None."""
+        norm = ' '.join(self.normalize(query).split())
+        if not norm:
+            return None
+        entry_id = self._exact.get(norm)
+        if entry_id is None:
+            entry_id = self._exact.get(norm.replace(' ', '_'))
+        if entry_id is not None:
+            return self.entries[entry_id]
+        query_tokens = set(tokenize(norm))
+        scores = defaultdict(int)
+        for token in query_tokens:
+            exact = self._tokens.get(token)
+            if exact:
+                for i in exact:
+                    scores[i] += 2
+            elif len(token) >= MIN_PREFIX_LEN:
+                for i in self._prefixes.get(token, ()):
+                    scores[i] += 1
+        if not scores:
+            return None
+        # Bonus quand tous les mots d'un nom de thème figurent dans la requête
+        for i in scores:
+            if any(name <= query_tokens for name in self._name_tokens[i]):
+                scores[i] += 3
+        best = min(scores, key=lambda i: (-scores[i], i))
+        return self.entries[best]
@@ -0,0 +1,158 @@
+import os
+
+# Taille maximale (caractères) d'une page de réponse du module Contexte
+CONTEXT_PAGE_MAX_CHARS = int(os.getenv("CONTEXT_PAGE_MAX_CHARS", "1200"))
+
+
+def render_context(key, context, lang):
+    """Texte affiché pour une entrée de contexte dans la langue `lang`."""
+    # Affichage enrichi pour les contextes de type vocabulaire ou liste
+    title = context.get('title', key) if isinstance(context, dict) else key
+    # Cas 1 : vocabulaire (champ 'words' ou 'phrases')
+    vocab_key = None
+    for k in ['words', 'phrases', 'vocabulaire', 'expressions']:
+        if isinstance(context, dict) and k in context and isinstance(context[k], dict):
+            vocab_key = k
+            break
+    if vocab_key:
+        lines = []
+        for mot, trad in context[vocab_key].items():
+            if isinstance(trad, dict):
+                if lang == 'fr':
+                    # Affiche la traduction anglaise pour chaque expression française
+                    en_val = trad.get('en', '-')
+                    if isinstance(en_val, list):
+                        en_val = ', '.join(str(x) for x in en_val)
+                    lines.append(f"{mot} : {en_val}")
+                elif lang == 'en':
+                    # Affiche chaque expression anglaise suivie de la traduction française
+                    en_val = trad.get('en', '-')
+                    fr_val = trad.get('fr', '-')
+                    if isinstance(en_val, list):
+                        for eng in en_val:
+                            lines.append(f"{eng} : {fr_val}")
+                    else:
+                        lines.append(f"{en_val} : {fr_val}")
+                else:
+                    # Pour l'arabe ou autre, fallback comportement précédent
+                    val = trad.get(lang, trad.get('fr') or trad.get('en') or trad.get('ar') or str(trad))
+                    if isinstance(val, list):
+                        val = ', '.join(str(x) for x in val)
+                    lines.append(f"{mot} : {val}")
+            elif isinstance(trad, list):
+                lines.append(f"{mot} : {', '.join(str(x) for x in trad)}")
+            else:
+                lines.append(f"{mot} : {trad}")
+        details = '\n'.join(lines)
+    # Cas 2 : dict contenant principalement des listes ou dicts
+    elif isinstance(context, dict):
+        # Si pas de history/summary, mais d'autres champs list/dict
+        details = context.get('history') or context.get('summary')
+        if not details:
+            # Cherche le premier champ list/dict non vide
+            details = None
+            for v in context.values():
+                if isinstance(v, (list, dict)):
+                    if isinstance(v, list):
+                        details = '\n'.join(str(x) for x in v)
+                    elif isinstance(v, dict):
+                        # Si dict multilingue, afficher la langue courante
+                        lines = []
+                        for k2, v2 in v.items():
+                            if isinstance(v2, dict):
+                                val = v2.get(lang, v2.get('fr') or v2.get('en') or v2.get('ar') or str(v2))
+                                if isinstance(val, list):
+                                    val = ' | '.join(str(x) for x in val)
+                                lines.append(f"{k2} : {val}")
+                            elif isinstance(v2, list):
+                                lines.append(f"{k2} : {' | '.join(str(x) for x in v2)}")
+                            else:
+                                lines.append(f"{k2} : {v2}")
+                        details = '\n'.join(lines)
+                    break
+        if not details:
+            # Fallback : premier champ texte
+            details = next((v for v in context.values() if isinstance(v, str)), str(context))
+    else:
+        details = str(context)
+    return f"{title} :\n{details}"
+
+
+def render_theme_menu(contexts, lang):
+    """Message d'accueil du module Contexte avec la liste des thèmes."""
+    def extract_titles(contexts):
+        themes = []
+        for key, val in contexts.items():
+            if isinstance(val, dict):
+                title_fr = val.get('title', '')
+                title_en = val.get('title_en', '')
+                title_ar = val.get('title_ar', '')
+                themes.append({'key': key, 'fr': title_fr, 'en': title_en, 'ar': title_ar})
+            else:
+                themes.append({'key': key, 'fr': key, 'en': key, 'ar': key})
+        return themes
+    all_themes = extract_titles(contexts)
+    if lang == 'fr':
+        msg = "Bienvenue dans le module Contexte !\nVoici la liste des thèmes disponibles dans le module :\n"
+        for t in all_themes:
+            titre = t['fr'] or t['key']
+            msg += f"- {titre}\n"
+        msg += "Donne-moi un thème ou tape 'menu' pour revenir."
+        return msg
+    elif lang == 'en':
+        msg = "Welcome to the Context module!\nHere is the list of available topics in the module:\n"
+        for t in all_themes:
+            titre = t['en'] or t['fr'] or t['key']
+            msg += f"- {titre}\n"
+        msg += "Give me a topic or type 'menu' to go back."
+        return msg
+    else:
+        msg = "مرحبا بك في وحدة السياق!\nهذه قائمة المواضيع المتوفرة في الوحدة:\n"
+        for t in all_themes:
+            titre = t['ar'] or t['fr'] or t['key']
+            msg += f"- {titre}\n"
+        msg += "أعطني موضوعًا أو اكتب 'menu' للرجوع."
+        return msg
+
+
+
+def paginate(text, max_chars=CONTEXT_PAGE_MAX_CHARS):
+    """Découpe `text` en pages d'au plus max_chars caractères, sur les fins de ligne si possible."""
+    pages, current = [], ''
+    for line in text.split('\n'):
+        # Ligne trop longue à elle seule : coupée sur les espaces
+        while len(line) > max_chars:
+            cut = line.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                pages.append(current)
+                current = ''
+            pages.append(line[:cut])
+            line = line[cut:].lstrip()
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > max_chars:
+            pages.append(current)
+            current = line
+        else:
+            current = candidate
+    if current or not pages:
+        pages.append(current)
+    return pages
+
+
+def render_page(pages, index, lang):
+    """Page `index` avec l'indication de pagination quand il y en a plusieurs."""
+    page = pages[index]
+    if len(pages) == 1:
+        return page
+    last = index == len(pages) - 1
+    if lang == 'fr':
+        hint = "Tape un autre thème ou 'menu'." if last else "Tape 'suite' pour lire la suite."
+        return f"{page}\n\n(page {index + 1}/{len(pages)}) {hint}"
+    elif lang == 'en':
+        hint = "Type another topic or 'menu'." if last else "Type 'more' to keep reading."
+        return f"{page}\n\n(page {index + 1}/{len(pages)}) {hint}"
+    else:
+        hint = "اكتب موضوعا آخر أو 'menu'." if last else "اكتب 'المزيد' للمتابعة."
+        return f"{page}\n\n(صفحة {index + 1}/{len(pages)}) {hint}"
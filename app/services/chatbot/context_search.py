@@ -0,0 +1,202 @@
+"""
+Recherche classée (BM25) et tolérante aux fautes (trigrammes) sur les contextes.
+
+Les documents sont les entrées de enriched_contexts_with_martyrs.json et de
+contexts.json : titres (pondérés), lignes d'historique/résumé, mots de
+vocabulaire et toutes les autres valeurs texte. Un mot absent du vocabulaire
+(« indepandance ») est remplacé par les mots indexés qui partagent le plus de
+trigrammes de caractères avec lui, puis les documents sont classés par BM25.
+
+Benchmark (latence en fonction du nombre de thèmes) :
+    python -m app.services.chatbot.context_search --bench
+"""
+import math
+import heapq
+from collections import defaultdict, Counter
+
+from .context_index import tokenize
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Poids des titres/clés par rapport au contenu
+TITLE_WEIGHT = 3
+# Similarité de Dice minimale (sur les trigrammes) pour corriger un mot
+MIN_TRIGRAM_SIMILARITY = 0.5
+MAX_EXPANSIONS = 3
+
+
+def trigrams(term):
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _iter_text(value):
+    """Toutes les chaînes d'une valeur JSON (valeurs et clés de dict)."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            yield str(k)
+            yield from _iter_text(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _iter_text(v)
+    elif value is not None:
+        yield str(value)
+
+
+class ContextSearch:
+    """Index BM25 + trigrammes construit une fois sur toutes les entrées de contexte."""
+
+    def __init__(self, sources, normalize):
+        self.normalize = normalize
+        self.docs = []
+        self._postings = defaultdict(list)
+        self._trigram_terms = defaultdict(set)
+        self._term_trigrams = {}
+        lengths = []
+        for source, data in sources:
+            for key, value in data.items():
+                tf = self._document_terms(key, value)
+                doc_id = len(self.docs)
+                title = value.get('title', key) if isinstance(value, dict) else key
+                self.docs.append((source, key, title))
+                lengths.append(sum(tf.values()))
+                for term, count in tf.items():
+                    self._postings[term].append((doc_id, count))
+        self._lengths = lengths
+        self._avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+        n = len(self.docs)
+        self._idf = {
+            term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+            for term, p in self._postings.items()
+        }
+        for term in self._postings:
+            grams = trigrams(term)
+            self._term_trigrams[term] = len(grams)
+            for gram in grams:
+                self._trigram_terms[gram].add(term)
+
+    def _document_terms(self, key, value):
+        tf = Counter()
+        names = [key.replace('_', ' ')]
+        if isinstance(value, dict):
+            names += [value[f] for f in ('title', 'title_en', 'title_ar') if isinstance(value.get(f), str)]
+        for name in names:
+            for token in tokenize(self.normalize(name)):
+                tf[token] += TITLE_WEIGHT
+        for text in _iter_text(value):
+            for token in tokenize(self.normalize(text)):
+                tf[token] += 1
+        return tf
+
+    def _expand(self, token):
+        """[(terme indexé, poids)] pour un mot de la requête."""
+        if token in self._postings:
+            return [(token, 1.0)]
+        grams = trigrams(token)
+        shared = Counter()
+        for gram in grams:
+            for term in self._trigram_terms.get(gram, ()):
+                shared[term] += 1
+        candidates = []
+        for term, count in shared.items():
+            similarity = 2 * count / (len(grams) + self._term_trigrams[term])
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                candidates.append((similarity, term))
+        return [(term, sim) for sim, term in heapq.nlargest(MAX_EXPANSIONS, candidates)]
+
+    def search(self, query, k=5):
+        """
+        Retourne au plus k résultats : [(score, source, clé, titre)] par score
+        décroissant, une seule fois par clé (la meilleure source l'emporte).
+        """
+        scores = defaultdict(float)
+        for token in set(tokenize(self.normalize(query))):
+            for term, weight in self._expand(token):
+                idf = self._idf[term]
+                for doc_id, tf in self._postings[term]:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / self._avgdl)
+                    scores[doc_id] += weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+        results = []
+        seen = set()
+        for doc_id, score in sorted(scores.items(), key=lambda item: (-item[1], item[0])):
+            source, key, title = self.docs[doc_id]
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append((round(score, 4), source, key, title))
+            if len(results) == k:
+                break
+        return results
+
+
+def _synthetic_theme(rng, i, vocabulary, weights):
+    """Thème tiré du vocabulaire réel (selon la fréquence des mots) : il partage termes et trigrammes avec les requêtes."""
+    words = lambda n: rng.choices(vocabulary, weights, k=n)
+    return {
+        "title": f"Thème {' '.join(words(2))} {i}",
+        "history": [" ".join(words(12)) for _ in range(4)],
+        "words": {w: {"en": e, "fr": f} for w, e, f in zip(words(20), words(20), words(20))},
+    }
+
+
+def _candidates(engine, query):
+    """Nombre d'entrées de postings lues par la requête (termes exacts et corrigés)."""
+    return sum(
+        len(engine._postings[term])
+        for token in set(tokenize(engine.normalize(query)))
+        for term, _ in engine._expand(token)
+    )
+
+
+def _benchmark(normalize, base_sources, sizes=(0, 100, 1000, 5000), queries=None, repeat=200):
+    """
+    Latence par requête quand on ajoute des thèmes synthétiques aux thèmes
+    réels. Les thèmes ajoutés reprennent le vocabulaire réel et les mots des
+    requêtes : ils entrent dans leurs postings et dans la correction par
+    trigrammes (colonne « candidats »).
+    """
+    import time
+    import random
+
+    rng = random.Random(42)
+    queries = queries or ["indepandance", "algerien war", "football", "fruits rouges", "martyr ben boulaid"]
+    base = ContextSearch(base_sources, normalize)
+    vocabulary = list(base._postings)
+    weights = [len(base._postings[term]) for term in vocabulary]
+    # Les termes (corrigés) des requêtes reviennent aussi souvent que le mot le plus courant
+    boost = max(weights, default=1)
+    for q in queries:
+        for token in set(tokenize(normalize(q))):
+            for term, _ in base._expand(token) or [(token, 1.0)]:
+                vocabulary.append(term)
+                weights.append(boost)
+    synthetic = {}
+    for size in sizes:
+        while len(synthetic) < size:
+            synthetic[f"synthetic_{len(synthetic)}"] = _synthetic_theme(rng, len(synthetic), vocabulary, weights)
+        start = time.perf_counter()
+        engine = ContextSearch(list(base_sources) + [("bench", synthetic)], normalize)
+        build = time.perf_counter() - start
+        candidates = sum(_candidates(engine, q) for q in queries) / len(queries)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for q in queries:
+                engine.search(q)
+        per_query = (time.perf_counter() - start) / (repeat * len(queries))
+        print(f"{len(engine.docs):>6} thèmes : construction {build * 1000:8.1f} ms | "
+              f"requête {per_query * 1e6:8.1f} µs | candidats {candidates:8.0f}")
+
+
+if __name__ == "__main__":
+    import sys
+    from .chatbot import normalize_text, content_registry, context_sources
+
+    sources = context_sources(content_registry.current())
+    if "--bench" in sys.argv:
+        _benchmark(normalize_text, sources)
+    else:
+        engine = ContextSearch(sources, normalize_text)
+        for result in engine.search(' '.join(sys.argv[1:])):
+            print(result)
@@ -0,0 +1,180 @@
+"""
+Recherche vectorielle (TF-IDF creux) sur les contextes.
+
+Chaque entrée de contexte devient une ligne d'une matrice creuse normalisée
+(L2) calculée au démarrage ; une requête coûte un produit matrice creuse x
+vecteur suivi d'un top-k par argpartition, le score étant la similarité
+cosinus. Deux représentations, ajustées sur les contextes :
+
+- char : n-grammes de caractères (3-5), tolérants aux fautes et aux variantes
+         (« revolution » / « révolutionnaire ») ;
+- word : mots et bigrammes de mots.
+
+Le TfidfVectorizer du classifieur d'intentions (intent_vectorizer.pkl) n'est
+pas réutilisé : son vocabulaire (quelques dizaines de termes) ne couvre pas
+les contextes.
+
+La matrice, le vocabulaire et les idf sont conservés sur disque (npz, sans
+pickle : le fichier est lu avec allow_pickle=False et ignoré s'il n'appartient
+pas à l'utilisateur du processus) et réutilisés au redémarrage tant que le
+contenu des contextes et le mode n'ont pas changé.
+
+Sélection : CHATBOT_CONTEXT_RETRIEVAL=bm25 (défaut, context_search) | char | word
+"""
+import os
+import json
+import hashlib
+import tempfile
+import logging
+
+from .context_search import TITLE_WEIGHT, _iter_text
+
+# Initialisation du logger
+logger = logging.getLogger(__name__)
+
+VECTOR_MODES = ("char", "word")
+CONTEXT_VECTORS_CACHE = os.getenv(
+    "CONTEXT_VECTORS_CACHE", os.path.join(tempfile.gettempdir(), f"fenn_context_vectors_{os.getuid()}.npz")
+)
+
+
+def _document_text(key, value):
+    names = [key.replace('_', ' ')]
+    if isinstance(value, dict):
+        names += [value[f] for f in ('title', 'title_en', 'title_ar') if isinstance(value.get(f), str)]
+    # Titres répétés pour peser autant que dans l'index BM25
+    return ' '.join(names * TITLE_WEIGHT + list(_iter_text(value)))
+
+
+def _fingerprint(mode, sources):
+    digest = hashlib.sha1(mode.encode())
+    for source, data in sources:
+        digest.update(source.encode())
+        digest.update(json.dumps(data, sort_keys=True, ensure_ascii=False).encode())
+    return digest.hexdigest()
+
+
+class ContextVectors:
+    """Même interface que ContextSearch : search(query, k) -> [(score, source, clé, titre)]."""
+
+    def __init__(self, sources, normalize, mode="char", cache_path=CONTEXT_VECTORS_CACHE):
+        if mode not in VECTOR_MODES:
+            raise ValueError(f"Mode de recherche vectorielle inconnu : {mode} (disponibles : {', '.join(VECTOR_MODES)})")
+        self.normalize = normalize
+        self.mode = mode
+        self.docs = []
+        texts = []
+        for source, data in sources:
+            for key, value in data.items():
+                title = value.get('title', key) if isinstance(value, dict) else key
+                self.docs.append((source, key, title))
+                texts.append(_document_text(key, value))
+        fingerprint = _fingerprint(mode, sources)
+        # L'analyseur ne dépend que des paramètres : inutile de conserver le vectorizer ajusté
+        self._analyzer = self._vectorizer(mode).build_analyzer()
+        cached = self._load_cache(cache_path, fingerprint)
+        if cached is not None:
+            self.matrix, self._vocabulary, self._idf = cached
+        else:
+            vectorizer = self._vectorizer(mode)
+            # Colonnes contiguës : la requête ne lit que les colonnes de ses termes
+            self.matrix = vectorizer.fit_transform([normalize(t) for t in texts]).tocsc()
+            self._vocabulary = vectorizer.vocabulary_
+            self._idf = vectorizer.idf_
+            self._save_cache(cache_path, fingerprint)
+
+    @staticmethod
+    def _vectorizer(mode):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        if mode == "char":
+            return TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), sublinear_tf=True)
+        return TfidfVectorizer(analyzer="word", ngram_range=(1, 2), sublinear_tf=True)
+
+    @staticmethod
+    def _load_cache(cache_path, fingerprint):
+        if not cache_path or not os.path.exists(cache_path):
+            return None
+        try:
+            import numpy as np
+            from scipy.sparse import csc_matrix
+
+            info = os.stat(cache_path)
+            if info.st_uid != os.getuid() or info.st_mode & 0o022:
+                logger.warning(f"[CONTEXT] Cache vectoriel ignoré ({cache_path}) : propriétaire ou droits inattendus")
+                return None
+            with np.load(cache_path, allow_pickle=False) as payload:
+                if str(payload["fingerprint"]) != fingerprint:
+                    return None
+                matrix = csc_matrix(
+                    (payload["data"], payload["indices"], payload["indptr"]), shape=tuple(payload["shape"])
+                )
+                vocabulary = {str(term): i for i, term in enumerate(payload["terms"])}
+                idf = payload["idf"]
+        except Exception as e:
+            logger.warning(f"[CONTEXT] Cache vectoriel illisible ({cache_path}) : {e}")
+            return None
+        logger.info(f"[CONTEXT] Matrice TF-IDF rechargée depuis {cache_path}")
+        return matrix, vocabulary, idf
+
+    def _save_cache(self, cache_path, fingerprint):
+        if not cache_path:
+            return
+        try:
+            import numpy as np
+
+            terms = [None] * len(self._vocabulary)
+            for term, i in self._vocabulary.items():
+                terms[i] = term
+            # Écriture atomique : un autre worker peut lire le fichier au même moment
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f, fingerprint=np.array(fingerprint), data=self.matrix.data, indices=self.matrix.indices,
+                    indptr=self.matrix.indptr, shape=np.array(self.matrix.shape), terms=np.array(terms, dtype=str),
+                    idf=self._idf,
+                )
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning(f"[CONTEXT] Impossible d'écrire le cache vectoriel ({cache_path}) : {e}")
+
+    def search(self, query, k=5):
+        """
+        Retourne au plus k résultats : [(score, source, clé, titre)] par
+        similarité cosinus décroissante, une seule fois par clé.
+        """
+        import numpy as np
+
+        if not self.docs or not query.strip():
+            return []
+        # Vecteur de la requête calculé directement (vectorizer.transform est
+        # plus coûteux que le produit lui-même sur une requête aussi courte)
+        counts = {}
+        for term in self._analyzer(self.normalize(query)):
+            col = self._vocabulary.get(term)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        if not counts:
+            return []
+        cols = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))) * self._idf[cols]
+        weights /= np.linalg.norm(weights)
+        scores = self.matrix[:, cols] @ weights
+        # Les doublons de clé (main/extra) peuvent consommer des places : marge de k
+        top = min(len(scores), 2 * k)
+        candidates = np.argpartition(-scores, top - 1)[:top]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        results = []
+        seen = set()
+        for doc_id in candidates:
+            score = float(scores[doc_id])
+            if score <= 0:
+                break
+            source, key, title = self.docs[doc_id]
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append((round(score, 4), source, key, title))
+            if len(results) == k:
+                break
+        return results
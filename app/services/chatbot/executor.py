@@ -0,0 +1,69 @@
+import os
+import asyncio
+import logging
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+# Initialisation du logger
+logger = logging.getLogger(__name__)
+
+# Nombre de threads dédiés au traitement des messages (0 = exécution directe sur la boucle)
+CHATBOT_EXECUTOR_WORKERS = int(os.getenv("CHATBOT_EXECUTOR_WORKERS", "4"))
+
+
+class ChatExecutor:
+    """
+    Exécute le traitement (synchrone) des messages hors de la boucle asyncio,
+    dans un pool de threads borné.
+
+    Les messages d'un même utilisateur sont traités dans l'ordre d'arrivée :
+    chaque utilisateur a son propre verrou asyncio, libéré (et supprimé)
+    dès que plus aucun message de cet utilisateur n'est en attente.
+    """
+
+    def __init__(self, max_workers=CHATBOT_EXECUTOR_WORKERS):
+        self.max_workers = max_workers
+        self._pool = None
+        self._user_locks = {}
+
+    def start(self, max_workers=None):
+        if max_workers is not None:
+            self.max_workers = max_workers
+        if self._pool is None and self.max_workers > 0:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chatbot")
+            logger.info(f"[EXECUTOR] Pool de {self.max_workers} threads démarré")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            logger.info("[EXECUTOR] Pool arrêté")
+
+    async def run(self, user_id, func, *args, **kwargs):
+        """Exécute func(*args, **kwargs) en respectant l'ordre des messages de `user_id`."""
+        entry = self._user_locks.get(user_id)
+        if entry is None:
+            entry = self._user_locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                if self.max_workers <= 0:
+                    return func(*args, **kwargs)
+                self.start()
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._pool, partial(func, *args, **kwargs))
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._user_locks.pop(user_id, None)
+
+
+chat_executor = ChatExecutor()
+
+
+def start_executor(max_workers=None):
+    chat_executor.start(max_workers)
+
+
+def shutdown_executor():
+    chat_executor.shutdown()
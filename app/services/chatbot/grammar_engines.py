@@ -0,0 +1,187 @@
+"""
+Moteurs d'inférence du correcteur grammatical (CPU).
+
+- transformers : pipeline 'text2text-generation' fp32 (comportement historique)
+- onnx         : modèle exporté et exécuté par ONNX Runtime (optimum)
+- int8         : modèle PyTorch quantifié dynamiquement en int8 (couches Linear)
+
+Tous exposent correct_batch(sentences) -> liste de phrases corrigées, et
+stream(sentence) -> générateur des morceaux de texte au fil de la génération.
+
+La parité des moteurs avec transformers est vérifiée par
+tests/test_grammar_engines.py. Benchmark :
+    python -m app.services.chatbot.grammar_engines --bench transformers onnx int8
+"""
+import os
+import sys
+import time
+import resource
+import threading
+import logging
+
+# Initialisation du logger
+logger = logging.getLogger(__name__)
+
+GRAMMAR_MODEL_NAME = os.getenv("GRAMMAR_MODEL_NAME", "prithivida/grammar_error_correcter_v1")
+GRAMMAR_ENGINE = os.getenv("GRAMMAR_ENGINE", "transformers").lower()
+# Dossier où l'export ONNX est conservé entre deux démarrages
+GRAMMAR_ONNX_DIR = os.getenv("GRAMMAR_ONNX_DIR", "")
+
+# Corpus fixe utilisé pour la parité et le benchmark
+PARITY_CORPUS = [
+    "she go to school every day",
+    "i has a dog",
+    "i am agree with you",
+    "he can to swim very well",
+    "i am student",
+    "he have two brothers",
+    "they was at home yesterday",
+    "my mother cook couscous on friday",
+    "we goes to the beach in summer",
+    "she don't like tea",
+]
+
+
+def stream_generate(model, tokenizer, sentence, max_length=64):
+    """Lance model.generate dans un thread et produit les morceaux décodés au fil de l'eau."""
+    from transformers import TextIteratorStreamer
+
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    inputs = tokenizer([f"gec: {sentence}"], return_tensors="pt")
+    thread = threading.Thread(
+        target=model.generate,
+        kwargs=dict(**inputs, max_length=max_length, streamer=streamer),
+        daemon=True,
+    )
+    thread.start()
+    for piece in streamer:
+        if piece:
+            yield piece
+    thread.join()
+
+
+class PipelineGrammarCorrector:
+    """Correcteur basé sur le pipeline transformers 'text2text-generation'."""
+
+    def __init__(self, pipe):
+        self.pipe = pipe
+
+    def stream(self, sentence, max_length=64):
+        return stream_generate(self.pipe.model, self.pipe.tokenizer, sentence, max_length)
+
+    def correct_batch(self, sentences, max_length=64):
+        outputs = self.pipe([f"gec: {s}" for s in sentences], max_length=max_length, batch_size=len(sentences))
+        # Le pipeline retourne un dict par entrée (ou une liste d'un dict selon la version)
+        return [(out[0] if isinstance(out, list) else out)['generated_text'] for out in outputs]
+
+
+class Seq2SeqGrammarCorrector:
+    """Correcteur générique (tokenizer + model.generate), pour ONNX Runtime ou PyTorch quantifié."""
+
+    def __init__(self, model, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+
+    def correct_batch(self, sentences, max_length=64):
+        inputs = self.tokenizer([f"gec: {s}" for s in sentences], return_tensors="pt", padding=True)
+        outputs = self.model.generate(**inputs, max_length=max_length)
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def stream(self, sentence, max_length=64):
+        return stream_generate(self.model, self.tokenizer, sentence, max_length)
+
+
+def _load_transformers():
+    # Import tardif : transformers est lent à importer
+    from transformers import pipeline
+    return PipelineGrammarCorrector(pipeline('text2text-generation', model=GRAMMAR_MODEL_NAME))
+
+
+def _load_onnx():
+    from transformers import AutoTokenizer
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    tokenizer = AutoTokenizer.from_pretrained(GRAMMAR_MODEL_NAME)
+    if GRAMMAR_ONNX_DIR and os.path.isdir(GRAMMAR_ONNX_DIR):
+        model = ORTModelForSeq2SeqLM.from_pretrained(GRAMMAR_ONNX_DIR)
+    else:
+        model = ORTModelForSeq2SeqLM.from_pretrained(GRAMMAR_MODEL_NAME, export=True)
+        if GRAMMAR_ONNX_DIR:
+            model.save_pretrained(GRAMMAR_ONNX_DIR)
+    return Seq2SeqGrammarCorrector(model, tokenizer)
+
+
+def _load_int8():
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    tokenizer = AutoTokenizer.from_pretrained(GRAMMAR_MODEL_NAME)
+    model = AutoModelForSeq2SeqLM.from_pretrained(GRAMMAR_MODEL_NAME).eval()
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return Seq2SeqGrammarCorrector(model, tokenizer)
+
+
+ENGINES = {
+    "transformers": _load_transformers,
+    "onnx": _load_onnx,
+    "int8": _load_int8,
+}
+
+
+def load_engine(name=GRAMMAR_ENGINE):
+    if name not in ENGINES:
+        raise ValueError(f"Moteur de correction inconnu : {name} (disponibles : {', '.join(ENGINES)})")
+    logger.info(f"[GRAMMAR] Chargement du moteur '{name}' ({GRAMMAR_MODEL_NAME})")
+    return ENGINES[name]()
+
+
+def _max_rss_mb():
+    # ru_maxrss est en Ko sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark(engine_name, corpus=PARITY_CORPUS, repeat=3):
+    """Latence (par phrase et par lot) et mémoire pour un moteur, dans le processus courant."""
+    rss_before = _max_rss_mb()
+    start = time.perf_counter()
+    engine = load_engine(engine_name)
+    load_time = time.perf_counter() - start
+    engine.correct_batch(corpus[:1])  # préchauffage
+    single = []
+    for _ in range(repeat):
+        for sentence in corpus:
+            t0 = time.perf_counter()
+            engine.correct_batch([sentence])
+            single.append(time.perf_counter() - t0)
+    batched = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        engine.correct_batch(corpus)
+        batched.append(time.perf_counter() - t0)
+    single.sort()
+    return {
+        "engine": engine_name,
+        "load_time_s": round(load_time, 2),
+        "p50_ms": round(single[len(single) // 2] * 1000, 1),
+        "p95_ms": round(single[int(len(single) * 0.95) - 1] * 1000, 1),
+        "batch_ms_per_sentence": round(min(batched) / len(corpus) * 1000, 1),
+        "max_rss_delta_mb": round(_max_rss_mb() - rss_before, 1),
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    mode, names = (sys.argv[1:2] or [""])[0], sys.argv[2:] or list(ENGINES)
+    if mode == "--bench":
+        # Un sous-processus par moteur pour que la mesure mémoire ne soit pas faussée
+        import subprocess
+        for name in names:
+            out = subprocess.run(
+                [sys.executable, "-c",
+                 "import json,sys;from app.services.chatbot.grammar_engines import benchmark;"
+                 f"print(json.dumps(benchmark({name!r})))"],
+                capture_output=True, text=True,
+            )
+            print(out.stdout.strip().splitlines()[-1] if out.returncode == 0 else f"{name}: échec\n{out.stderr}")
+    else:
+        print(__doc__)
@@ -0,0 +1,101 @@
+import bisect
+import threading
+
+# Registre en mémoire des métriques du chatbot (par processus)
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class Histogram:
+    """Histogramme à seuils fixes (compatible avec un export type Prometheus)."""
+
+    def __init__(self, name, buckets):
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = []
+        running = 0
+        for bound, c in zip(list(self.buckets) + ["+Inf"], counts):
+            running += c
+            cumulative.append({"le": bound, "count": running})
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "mean": round(total / count, 6) if count else None,
+            "buckets": cumulative,
+        }
+
+
+class Counter:
+    """Compteur monotone thread-safe."""
+
+    def __init__(self, name):
+        self.name = name
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def snapshot(self):
+        return self._value
+
+
+class Gauge:
+    """Valeur instantanée lue au moment de l'export (taille d'un cache, ...)."""
+
+    def __init__(self, name, read):
+        self.name = name
+        self.read = read
+
+    def snapshot(self):
+        return self.read()
+
+
+def histogram(name, buckets):
+    """Retourne l'histogramme `name`, créé au premier appel."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, buckets)
+        return _registry[name]
+
+
+def counter(name):
+    """Retourne le compteur `name`, créé au premier appel."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name)
+        return _registry[name]
+
+
+def gauge(name, read):
+    """Enregistre (ou remplace) la jauge `name`, lue via read()."""
+    with _registry_lock:
+        _registry[name] = Gauge(name, read)
+        return _registry[name]
+
+
+def metrics_snapshot():
+    with _registry_lock:
+        items = list(_registry.items())
+    return {name: metric.snapshot() for name, metric in sorted(items)}
@@ -0,0 +1,166 @@
+import os
+import time
+import threading
+import logging
+from pathlib import Path
+
+from .grammar_engines import load_engine, GRAMMAR_ENGINE
+
+# Initialisation du logger
+logger = logging.getLogger(__name__)
+
+# Temps d'attente max (secondes) quand un message arrive pendant le chargement
+GRAMMAR_MODEL_WAIT = float(os.getenv("GRAMMAR_MODEL_WAIT", "2"))
+# 'inprocess' : chaque worker charge ses modèles ; 'sidecar' : modèles servis par model_server
+MODEL_BACKEND = os.getenv("CHATBOT_MODEL_BACKEND", "inprocess").lower()
+# Délais (secondes) avant chaque nouvelle tentative après un échec de chargement ; vide = pas de reprise
+MODEL_RETRY_DELAYS = tuple(
+    float(x) for x in os.getenv("MODEL_RETRY_DELAYS", "30,120,600").split(",") if x.strip()
+)
+# Dossier des modèles joblib (classifieur d'intentions)
+MODEL_DIR = Path(__file__).resolve().parents[2] / "data" / "chatbot"
+
+
+class ModelManager:
+    """
+    Charge un modèle dans un thread d'arrière-plan et expose son état.
+
+    Le chargement démarre avec start() (au démarrage de l'API) ou au premier
+    appel de get(). Tant que le modèle n'est pas prêt, get() attend au plus
+    `timeout` secondes puis retourne None.
+
+    Après un échec, l'état passe à « failed » (failed() est vrai, get()
+    retourne None sans attendre) et le chargement est retenté après chacun des
+    délais de retry_delays ; l'erreur et la prochaine tentative sont visibles
+    dans status().
+    """
+
+    def __init__(self, name, loader, retry_delays=MODEL_RETRY_DELAYS):
+        self.name = name
+        self._loader = loader
+        self.retry_delays = tuple(retry_delays)
+        self._model = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.started_at = None
+        self.load_time = None
+        self.error = None
+        self.attempts = 0
+        self.next_retry_at = None
+
+    def start(self):
+        """Lance le chargement en arrière-plan (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.time()
+            self._thread = threading.Thread(
+                target=self._load, name=f"model-loader-{self.name}", daemon=True
+            )
+            self._thread.start()
+        logger.info(f"[MODEL] Chargement de '{self.name}' lancé en arrière-plan")
+
+    def _load(self):
+        for delay in (0,) + self.retry_delays:
+            if delay:
+                self.next_retry_at = time.time() + delay
+                time.sleep(delay)
+                self.next_retry_at = None
+            self.attempts += 1
+            start = time.perf_counter()
+            try:
+                self._model = self._loader()
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"[MODEL] Échec du chargement de '{self.name}' (tentative {self.attempts}) : {e}")
+                # Les messages en attente repartent tout de suite au lieu d'attendre la reprise
+                self._ready.set()
+                continue
+            self.load_time = time.perf_counter() - start
+            self.error = None
+            logger.info(f"[MODEL] '{self.name}' chargé en {self.load_time:.2f}s")
+            self._ready.set()
+            return
+        logger.error(f"[MODEL] '{self.name}' indisponible après {self.attempts} tentative(s)")
+
+    def failed(self):
+        """Vrai si le dernier chargement a échoué (une reprise peut être programmée)."""
+        return self._model is None and self.error is not None
+
+    def is_ready(self):
+        return self._ready.is_set() and self._model is not None
+
+    def get(self, timeout=None):
+        """Retourne le modèle, ou None s'il n'est pas prêt après `timeout` secondes."""
+        self.start()
+        self._ready.wait(timeout)
+        return self._model
+
+    def status(self):
+        if self.is_ready():
+            state = "ready"
+        elif self.error:
+            state = "failed"
+        elif self._thread is not None:
+            state = "loading"
+        else:
+            state = "idle"
+        return {
+            "name": self.name,
+            "state": state,
+            "load_time": round(self.load_time, 3) if self.load_time is not None else None,
+            "error": self.error,
+            "attempts": self.attempts,
+            "next_retry_at": self.next_retry_at,
+        }
+
+
+def load_grammar_corrector():
+    # Moteur sélectionné par GRAMMAR_ENGINE (transformers, onnx, int8)
+    return load_engine(GRAMMAR_ENGINE)
+
+
+def load_intent_models():
+    """Retourne (vectorizer, intent_model) chargés depuis MODEL_DIR."""
+    import joblib
+    vectorizer = joblib.load(MODEL_DIR / "intent_vectorizer.pkl")
+    intent_model = joblib.load(MODEL_DIR / "intent_classifier.pkl")
+    return vectorizer, intent_model
+
+
+def predict_intents_with(vectorizer, intent_model, texts):
+    """
+    Prédit les intentions de textes déjà nettoyés en une seule opération
+    matricielle. Retourne une liste de (label, probabilité) ; la probabilité
+    vaut None si le classifieur n'expose pas predict_proba.
+    """
+    matrix = vectorizer.transform(texts)
+    if hasattr(intent_model, "predict_proba"):
+        proba = intent_model.predict_proba(matrix)
+        best = proba.argmax(axis=1)
+        classes = intent_model.classes_
+        return [(str(classes[j]), float(proba[i, j])) for i, j in enumerate(best)]
+    return [(str(label), None) for label in intent_model.predict(matrix)]
+
+
+def _load_remote_grammar_corrector():
+    from .model_server import RemoteGrammarCorrector, get_model_client
+    client = get_model_client()
+    client.wait_until_ready()
+    return RemoteGrammarCorrector(client)
+
+
+grammar_model = ModelManager(
+    "grammar_corrector",
+    _load_remote_grammar_corrector if MODEL_BACKEND == "sidecar" else load_grammar_corrector,
+)
+
+
+def start_model_warmup():
+    """Démarre le chargement des modèles lourds sans bloquer l'API."""
+    grammar_model.start()
+
+
+def models_status():
+    return {"backend": MODEL_BACKEND, "engine": GRAMMAR_ENGINE, "grammar_corrector": grammar_model.status()}
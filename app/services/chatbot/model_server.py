@@ -0,0 +1,218 @@
+"""
+Serveur de modèles partagé par tous les workers uvicorn.
+
+Le processus serveur possède seul le correcteur grammatical et le classifieur
+d'intentions ; les workers de l'API (CHATBOT_MODEL_BACKEND=sidecar) lui
+envoient leurs requêtes via un socket Unix local.
+
+Les messages du socket sont des pickles : MODEL_SERVER_AUTHKEY (secret partagé
+par le serveur et les workers) est obligatoire, et le socket est créé dans un
+dossier privé (0700, appartenant à l'utilisateur du processus), lui-même en 0600.
+
+Lancement :
+    MODEL_SERVER_AUTHKEY=... python -m app.services.chatbot.model_server
+"""
+import os
+import stat
+import time
+import tempfile
+import threading
+import logging
+from multiprocessing.connection import Listener, Client
+
+from .batching import MicroBatcher
+
+# Initialisation du logger
+logger = logging.getLogger(__name__)
+
+MODEL_SERVER_ADDRESS = os.getenv(
+    "MODEL_SERVER_ADDRESS", os.path.join(tempfile.gettempdir(), f"fenn_models_{os.getuid()}", "models.sock")
+)
+# Pas de valeur par défaut : une clé connue permettrait à tout processus local d'exécuter du code
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "")
+# Délai max d'attente du serveur au démarrage d'un worker (secondes)
+MODEL_SERVER_CONNECT_TIMEOUT = float(os.getenv("MODEL_SERVER_CONNECT_TIMEOUT", "120"))
+# Délai max d'attente d'une réponse du serveur (secondes)
+MODEL_SERVER_CALL_TIMEOUT = float(os.getenv("MODEL_SERVER_CALL_TIMEOUT", "60"))
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+def _require_authkey(authkey):
+    if not authkey:
+        raise ModelServerError("MODEL_SERVER_AUTHKEY doit être défini (secret partagé serveur / workers)")
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def _private_directory(address, create=False):
+    """Vérifie (ou crée) le dossier du socket : appartenant à l'utilisateur courant, mode 0700."""
+    directory = os.path.dirname(os.path.abspath(address))
+    if create:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise ModelServerError(
+            f"Dossier du socket non privé : {directory} (doit appartenir à l'utilisateur courant, mode 0700)"
+        )
+    return directory
+
+
+class ModelClient:
+    """Client du serveur de modèles : une connexion par thread, reconnectée si besoin."""
+
+    def __init__(self, address=MODEL_SERVER_ADDRESS, authkey=MODEL_SERVER_AUTHKEY, timeout=MODEL_SERVER_CALL_TIMEOUT):
+        self.address = address
+        self.authkey = _require_authkey(authkey)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            _private_directory(self.address)
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def call(self, op, payload=None):
+        for attempt in (1, 2):
+            try:
+                conn = self._connection()
+                conn.send((op, payload))
+                if not conn.poll(self.timeout):
+                    # Une réponse tardive décalerait les suivantes : la connexion est abandonnée
+                    self._reset()
+                    raise ModelServerError(f"Pas de réponse du serveur de modèles après {self.timeout}s ({op})")
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError) as e:
+                self._reset()
+                if attempt == 2:
+                    raise ModelServerError(f"Serveur de modèles injoignable ({self.address}) : {e}")
+        if status != "ok":
+            raise ModelServerError(result)
+        return result
+
+    def wait_until_ready(self, timeout=MODEL_SERVER_CONNECT_TIMEOUT):
+        """Attend que le serveur réponde et que ses modèles soient chargés."""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                if self.call("ping"):
+                    return
+            except ModelServerError:
+                pass
+            if time.time() > deadline:
+                raise ModelServerError(f"Serveur de modèles non prêt après {timeout}s")
+            time.sleep(0.5)
+
+
+class RemoteGrammarCorrector:
+    """Même interface que PipelineGrammarCorrector, exécutée par le serveur."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def correct_batch(self, sentences, max_length=64):
+        return self.client.call("correct", list(sentences))
+
+    def stream(self, sentence, max_length=64):
+        # Pas de streaming à travers le socket : la phrase corrigée arrive en un seul morceau
+        yield self.correct_batch([sentence])[0]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_model_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ModelClient()
+        return _client
+
+
+class ModelServer:
+    """Charge les modèles une fois et répond aux workers (un thread par connexion)."""
+
+    def __init__(self, address=MODEL_SERVER_ADDRESS, authkey=MODEL_SERVER_AUTHKEY):
+        from .model_manager import load_intent_models, ModelManager, load_grammar_corrector, predict_intents_with
+
+        self.address = address
+        self.authkey = _require_authkey(authkey)
+        _private_directory(address, create=True)
+        self.vectorizer, self.intent_model = load_intent_models()
+        self._predict_intents = predict_intents_with
+        self.grammar_model = ModelManager("grammar_corrector", load_grammar_corrector)
+        self.grammar_model.start()
+        # Les lots envoyés par les différents workers sont regroupés ici aussi
+        self.batcher = MicroBatcher(
+            "model_server_grammar",
+            lambda sentences: self.grammar_model.get().correct_batch(sentences),
+            int(os.getenv("GRAMMAR_BATCH_MAX_SIZE", "8")),
+            float(os.getenv("GRAMMAR_BATCH_WAIT_MS", "10")),
+        )
+
+    def handle(self, op, payload):
+        if op == "ping":
+            return self.grammar_model.is_ready()
+        if op == "correct":
+            if self.grammar_model.get() is None:
+                raise ModelServerError(self.grammar_model.error or "correcteur indisponible")
+            return self.batcher.submit_many(payload)
+        if op == "predict_intents":
+            return self._predict_intents(self.vectorizer, self.intent_model, payload)
+        raise ModelServerError(f"Opération inconnue : {op}")
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self.handle(op, payload))
+                except Exception as e:
+                    logger.error(f"[MODEL_SERVER] Erreur sur '{op}' : {e}")
+                    reply = ("error", str(e))
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        # Socket créé directement en 0600 (umask), sans fenêtre où il serait ouvert à tous
+        old_umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(old_umask)
+        with listener:
+            logger.info(f"[MODEL_SERVER] En écoute sur {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"[MODEL_SERVER] Connexion refusée : {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ModelServer().serve_forever()
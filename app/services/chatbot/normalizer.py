@@ -0,0 +1,89 @@
+"""
+Normalisation de texte multilingue (fr/en/ar/darija) pour la recherche.
+
+- Latin : minuscules et suppression des accents (équivalent à la
+  décomposition NFD + suppression des marques, via une table str.translate
+  précalculée).
+- Arabe : suppression des tashkeel et du tatweel, unification des alef
+  (أ إ آ ٱ -> ا), ى -> ي, ة -> ه, ؤ -> و, ئ -> ي.
+- Darija en alphabet latin (normalize_darija) : chiffres utilisés comme
+  lettres (3 -> a, 7 -> h, 9 -> q, ...) quand ils sont collés à des lettres.
+
+Les résultats sont mémoïsés : le corpus statique (clés, titres) ne coûte
+qu'une fois.
+
+Vérifications : tests/test_normalizer.py. Micro-benchmark :
+    python -m app.services.chatbot.normalizer --bench
+"""
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+
+NORMALIZE_CACHE_SIZE = 65536
+
+
+def _build_fold_table():
+    table = {}
+    for cp in range(0x80, 0x3000):
+        char = chr(cp)
+        if unicodedata.category(char) == 'Mn':
+            # Marque combinante isolée (accent, tashkeel, ...) : supprimée
+            table[cp] = None
+            continue
+        folded = ''.join(c for c in unicodedata.normalize('NFD', char)
+                         if unicodedata.category(c) != 'Mn')
+        if folded != char:
+            table[cp] = folded
+    # Ligatures courantes en français
+    table.update({ord('œ'): 'oe', ord('æ'): 'ae', ord('ß'): 'ss'})
+    # Arabe : tatweel et variantes de lettres
+    table[0x0640] = None
+    for alef in 'أإآٱ':
+        table[ord(alef)] = 'ا'
+    table.update({ord('ى'): 'ي', ord('ة'): 'ه', ord('ؤ'): 'و', ord('ئ'): 'ي'})
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+
+# Chiffres du darija latin (arabizi) -> lettre la plus proche
+DARIJA_DIGITS = {'2': 'a', '3': 'a', '5': 'kh', '7': 'h', '8': 'gh', '9': 'q'}
+_DARIJA_DIGIT_RE = re.compile(r"(?<=[a-z])[235789]|[235789](?=[a-z])")
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_text(text):
+    """Minuscules, sans accents ni tashkeel, lettres arabes unifiées."""
+    return text.lower().translate(_FOLD_TABLE)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_darija(text):
+    """normalize_text + chiffres arabizi convertis en lettres (« 3ndi » -> « andi »)."""
+    return _DARIJA_DIGIT_RE.sub(lambda m: DARIJA_DIGITS[m.group()], normalize_text(text))
+
+
+def _legacy_normalize_text(text):
+    # Implémentation d'origine, conservée pour le benchmark
+    return ''.join(c for c in unicodedata.normalize('NFD', text)
+                   if unicodedata.category(c) != 'Mn').lower()
+
+
+def _bench(repeat=20000):
+    import timeit
+
+    samples = ["Équipe nationale de football d'Algérie", "La Guerre d'Algérie (1954–1962)",
+               "pronouns_translation", "الْجَزَائِر العاصمة"]
+    for sample in samples:
+        legacy = timeit.timeit(lambda: _legacy_normalize_text(sample), number=repeat) / repeat
+        uncached = timeit.timeit(lambda: sample.lower().translate(_FOLD_TABLE), number=repeat) / repeat
+        cached = timeit.timeit(lambda: normalize_text(sample), number=repeat) / repeat
+        print(f"{sample[:30]:<32} ancien {legacy * 1e6:6.2f} µs | table {uncached * 1e6:6.2f} µs | mémo {cached * 1e6:6.2f} µs")
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        _bench()
+    else:
+        print(__doc__)
@@ -0,0 +1,265 @@
+"""
+Banque de questions de quiz compilée au chargement du contenu.
+
+Les fichiers de quiz mélangent deux formats (liste 'choices' ou dict
+'options') et la réponse peut être la lettre ou le texte de l'option.
+compile_quiz_bank les ramène une fois pour toutes à des enregistrements
+immuables (QuizQuestion) : options ordonnées, lettre et texte de la bonne
+réponse, ensembles de réponses acceptées et de réponses valides déjà en
+minuscules. Corriger une réponse revient à deux tests d'appartenance.
+
+Chaque question reçoit un identifiant entier calculé sur son contenu
+(question, options, bonne réponse ; casse et espaces ignorés) : il ne change
+pas quand le fichier est réordonné ou rechargé, et les sessions, la
+progression et l'historique des questions posées s'y réfèrent. Cet historique
+est le planning de révision de l'utilisateur (review) : le quiz saute les
+questions qui y figurent déjà. convert_asked ne sert qu'à vérifier qu'un
+ancien suivi indexé par texte (asked_questions.json) se retrouve dans la
+banque. Deux entrées
+de même identifiant sont des doublons : seule la première est gardée (même
+d'un niveau à l'autre) et le rapport de compilation les liste.
+
+Une question mal formée (réponse ne correspondant à aucune option, options
+manquantes, ...) fait refuser le fichier au rechargement (PartialContentError) :
+le registre de contenu garde l'ancienne version au lieu de produire une erreur
+pendant le quiz. Au démarrage, faute d'ancienne version, la banque est
+compilée avec strict=False : les questions mal formées sont seulement écartées.
+
+Rapport de compilation (doublons, questions mal formées, historique à convertir) :
+    python -m app.services.chatbot.quiz_bank app/data/chatbot/quiz_by_level_*.json \
+        [--asked app/data/chatbot/asked_questions.json]
+"""
+import sys
+import json
+import hashlib
+from typing import NamedTuple
+
+from .content import ContentError, PartialContentError
+
+OPTION_KEYS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+class QuizQuestion(NamedTuple):
+    id: int
+    level: str
+    question: str
+    options: tuple        # ((lettre, texte), ...) dans l'ordre d'affichage
+    correct_key: str
+    correct_text: str
+    accepted: frozenset   # lettre et texte de la bonne réponse, en minuscules
+    valid: frozenset      # toutes les lettres et tous les textes, en minuscules
+    explanation: str
+    text: str             # question et options, prêtes à afficher
+
+    def grade(self, user_input):
+        """True / False, ou None si la saisie n'est ni une lettre ni le texte d'une option."""
+        answer = user_input.strip().lower()
+        if answer in self.accepted:
+            return True
+        return False if answer in self.valid else None
+
+    @property
+    def option_keys(self):
+        return [key for key, _ in self.options]
+
+
+class QuizBank:
+    """Questions d'un fichier de quiz : identifiant -> QuizQuestion, et identifiants par niveau."""
+
+    def __init__(self, questions, levels):
+        self.questions = {q.id: q for q in questions}
+        self.levels = {level: tuple(ids) for level, ids in levels.items()}
+        # Tous les identifiants, niveau par niveau (ordre d'introduction en révision)
+        self.order = tuple(qid for ids in self.levels.values() for qid in ids)
+        # Texte normalisé -> identifiant, pour convertir un suivi indexé par texte
+        self._by_text = {}
+        for q in questions:
+            self._by_text.setdefault(_norm(q.question), q.id)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def get(self, question_id):
+        return self.questions.get(question_id)
+
+    def id_for_text(self, text):
+        return self._by_text.get(_norm(text))
+
+    def level(self, level):
+        """Identifiants des questions du niveau, dans l'ordre du fichier."""
+        return self.levels.get(level, ())
+
+
+class QuizBuildReport:
+    """Doublons écartés et questions mal formées rencontrés par compile_quiz_bank."""
+
+    def __init__(self):
+        self.duplicates = []   # (identifiant, emplacement gardé, emplacement écarté, question)
+        self.same_text = []    # même question, options ou réponse différentes : gardées toutes les deux
+        self.malformed = []    # (emplacement, message)
+
+    def lines(self):
+        out = [f"  doublon écarté : {dup} = {kept} (#{qid}) « {question} »" for qid, kept, dup, question in self.duplicates]
+        out += [f"  même question, options différentes : {a} / {b} « {question} »" for a, b, question in self.same_text]
+        out += [f"  mal formée : {where} : {message}" for where, message in self.malformed]
+        return out
+
+
+def _norm(text):
+    return ' '.join(str(text).lower().split())
+
+
+def question_id(question, options, correct_text):
+    """Identifiant stable (entier 32 bits) d'une question, indépendant de sa position et de la casse."""
+    key = '\x1f'.join([_norm(question), *sorted(_norm(text) for _, text in options), _norm(correct_text)])
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=4).digest(), 'big'), key
+
+
+def _options(raw, where):
+    if isinstance(raw.get('options'), dict):
+        options = tuple((str(k).strip().lower(), str(v).strip()) for k, v in raw['options'].items())
+    elif isinstance(raw.get('choices'), list):
+        if len(raw['choices']) > len(OPTION_KEYS):
+            raise ContentError(f"{where} : trop d'options")
+        options = tuple((OPTION_KEYS[i], str(v).strip()) for i, v in enumerate(raw['choices']))
+    else:
+        raise ContentError(f"{where} : 'choices' (liste) ou 'options' (dict) requis")
+    if len(options) < 2:
+        raise ContentError(f"{where} : au moins deux options requises")
+    return options
+
+
+def _correct_option(options, answer, where):
+    if not isinstance(answer, str) or not answer.strip():
+        raise ContentError(f"{where} : 'answer' doit être le texte ou la lettre d'une option")
+    answer = answer.strip().lower()
+    # Le texte de l'option prime : une réponse « a » désigne l'option « a » avant la lettre A
+    for key, text in options:
+        if text.lower() == answer:
+            return key, text
+    for key, text in options:
+        if key == answer:
+            return key, text
+    raise ContentError(f"{where} : la réponse '{answer}' ne correspond à aucune option")
+
+
+def compile_question(level, raw, where):
+    """Retourne (QuizQuestion, clé de contenu) ; lève ContentError si la question est mal formée."""
+    if not isinstance(raw, dict) or not isinstance(raw.get('question'), str) or not raw['question'].strip():
+        raise ContentError(f"{where} : champ 'question' requis")
+    options = _options(raw, where)
+    correct_key, correct_text = _correct_option(options, raw.get('answer'), where)
+    question = raw['question'].strip()
+    qid, key = question_id(question, options, correct_text)
+    return QuizQuestion(
+        id=qid,
+        level=level,
+        question=question,
+        options=options,
+        correct_key=correct_key,
+        correct_text=correct_text,
+        accepted=frozenset((correct_key, correct_text.lower())),
+        valid=frozenset([key for key, _ in options] + [text.lower() for _, text in options]),
+        explanation=raw.get('explanation') or '',
+        text=question + "\n" + "\n".join(f"{k.upper()}) {t}" for k, t in options),
+    ), key
+
+
+def compile_quiz_bank(data, report=None, strict=True):
+    """
+    {niveau: [question, ...]} -> QuizBank, doublons écartés. Si une question
+    est mal formée (toutes sont listées dans `report`), lève
+    PartialContentError, ou l'écarte simplement si strict est faux.
+    """
+    if not isinstance(data, dict):
+        raise ContentError("un dict niveau -> questions est attendu")
+    report = report if report is not None else QuizBuildReport()
+    questions, levels = [], {}
+    seen = {}        # identifiant -> (clé de contenu, emplacement)
+    seen_text = {}   # question normalisée -> emplacement
+    for level, raw_questions in data.items():
+        if not isinstance(raw_questions, list):
+            report.malformed.append((f"niveau '{level}'", "liste de questions attendue"))
+            continue
+        ids = levels[level] = []
+        for i, raw in enumerate(raw_questions):
+            where = f"{level}[{i}]"
+            try:
+                question, key = compile_question(level, raw, f"niveau '{level}', question {i}")
+            except ContentError as e:
+                report.malformed.append((where, str(e)))
+                continue
+            if question.id in seen:
+                other_key, kept = seen[question.id]
+                if other_key != key:
+                    # Collision de hachage (32 bits) : à corriger dans le fichier, pas à deviner
+                    report.malformed.append((where, f"identifiant {question.id} déjà attribué à {kept}"))
+                else:
+                    report.duplicates.append((question.id, kept, where, question.question))
+                continue
+            seen[question.id] = (key, where)
+            text = _norm(question.question)
+            if text in seen_text:
+                report.same_text.append((seen_text[text], where, question.question))
+            else:
+                seen_text[text] = where
+            questions.append(question)
+            ids.append(question.id)
+    if report.malformed and strict:
+        where, message = report.malformed[0]
+        raise PartialContentError(f"{len(report.malformed)} question(s) mal formée(s), dont {where} : {message}")
+    return QuizBank(questions, levels)
+
+
+def convert_asked(bank, asked):
+    """
+    Historique indexé par texte ({"user_niveau": [question, ...]}) -> par
+    identifiant ; retourne (historique converti, textes inconnus).
+    """
+    converted, unknown = {}, []
+    for owner, texts in asked.items():
+        ids = converted[owner] = []
+        for text in texts:
+            qid = bank.id_for_text(text)
+            if qid is None:
+                unknown.append(text)
+            elif qid not in ids:
+                ids.append(qid)
+    return converted, unknown
+
+
+def _report(paths, asked_path=None):
+    asked = None
+    if asked_path:
+        with open(asked_path, 'r', encoding='utf-8') as f:
+            asked = json.load(f)
+    failed = False
+    for path in paths:
+        report = QuizBuildReport()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                bank = compile_quiz_bank(json.load(f), report)
+        except (OSError, ValueError) as e:
+            failed = True
+            print(f"{path} : REFUSÉ ({e})")
+            bank = None
+        else:
+            per_level = ', '.join(f"{level} {len(ids)}" for level, ids in bank.levels.items())
+            print(f"{path} : {len(bank)} questions ({per_level}), {len(report.duplicates)} doublon(s) écarté(s)")
+        for line in report.lines():
+            print(line)
+        if bank is not None and asked is not None:
+            converted, unknown = convert_asked(bank, asked)
+            total = sum(len(ids) for ids in converted.values())
+            print(f"  {asked_path} : {total} question(s) posée(s) retrouvée(s), {len(unknown)} inconnue(s)")
+    return failed
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asked_path = None
+    if "--asked" in args:
+        i = args.index("--asked")
+        asked_path = args[i + 1]
+        del args[i:i + 2]
+    sys.exit(1 if _report(args, asked_path) else 0)
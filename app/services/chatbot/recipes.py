@@ -0,0 +1,174 @@
+"""
+Recherche de recettes (recettes_algeriennes_etapes_detaillees_complet.json).
+
+Les index sont construits une fois au chargement :
+- ingrédient (mot normalisé, fr et en) -> ensemble de recettes, pour répondre
+  à « qu'est-ce que je peux cuisiner avec semoule et pois chiches » par une
+  intersection d'ensembles ;
+- nom de recette (exact et par mot) pour « recette du couscous ».
+
+Les étapes sont servies une par une : la session ne garde que la clé de la
+recette et l'index de l'étape. La clé (recipe_key) est calculée sur le contenu
+de la recette, comme les identifiants de quiz_bank : après un rechargement,
+elle désigne la même recette, ou plus aucune si la recette a changé.
+"""
+import json
+import hashlib
+from collections import defaultdict
+
+from .context_index import tokenize
+
+# Mots des questions qui ne désignent jamais un ingrédient
+QUERY_STOP_WORDS = {
+    'recette', 'recettes', 'recipe', 'recipes', 'cuisiner', 'cook', 'faire', 'make',
+    'avec', 'with', 'quoi', 'what', 'peux', 'can', 'plat', 'dish', 'comment', 'how',
+}
+
+
+def _term(token):
+    # Pluriel simple : « chiches » et « chiche » partagent la même entrée
+    return token[:-1] if len(token) > 3 and token[-1] in 'sx' else token
+
+
+def recipe_key(recipe):
+    """Identifiant stable (entier 32 bits) calculé sur le contenu de la recette."""
+    data = json.dumps(recipe, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return int.from_bytes(hashlib.blake2b(data.encode('utf-8'), digest_size=4).digest(), 'big')
+
+
+class RecipeIndex:
+    """Index des recettes par ingrédient et par nom."""
+
+    def __init__(self, data, normalize):
+        # data : {'salées': [recette, ...], 'sucrées': [...]}
+        self.normalize = normalize
+        self.recipes = []
+        self._by_ingredient = defaultdict(set)
+        self._by_name = {}
+        self._name_tokens = defaultdict(set)
+        self._name_lengths = []
+        self._keys = []
+        self._by_key = {}
+        for category, recipes in (data or {}).items():
+            for recipe in recipes:
+                if isinstance(recipe, dict) and recipe.get('nom'):
+                    self._add(category, recipe)
+
+    def _terms(self, text):
+        return {_term(t) for t in tokenize(self.normalize(text)) if t not in QUERY_STOP_WORDS}
+
+    def _add(self, category, recipe):
+        recipe_id = len(self.recipes)
+        self.recipes.append((category, recipe))
+        key = recipe_key(recipe)
+        self._keys.append(key)
+        self._by_key.setdefault(key, recipe_id)
+        for ingredient in recipe.get('ingredients', []) + recipe.get('ingredients_en', []):
+            for term in self._terms(ingredient):
+                self._by_ingredient[term].add(recipe_id)
+        name = ' '.join(self.normalize(recipe['nom']).split())
+        self._by_name.setdefault(name, recipe_id)
+        terms = self._terms(name)
+        self._name_lengths.append(len(terms))
+        for term in terms:
+            self._name_tokens[term].add(recipe_id)
+
+    def get(self, recipe_id):
+        return self.recipes[recipe_id][1]
+
+    def key(self, recipe_id):
+        """Clé stable de la recette, à garder dans la session à la place de sa position."""
+        return self._keys[recipe_id]
+
+    def find_by_key(self, key):
+        """Position de la recette de clé `key` dans cet index, ou None si elle n'existe plus."""
+        return self._by_key.get(key)
+
+    def find_by_name(self, query):
+        """Identifiant de la recette dont le nom correspond le mieux à `query`, ou None."""
+        norm = ' '.join(self.normalize(query).split())
+        if norm in self._by_name:
+            return self._by_name[norm]
+        scores = defaultdict(int)
+        for term in self._terms(norm):
+            for recipe_id in self._name_tokens.get(term, ()):
+                scores[recipe_id] += 1
+        if not scores:
+            return None
+        # À score égal, le nom le plus court (« Makrout » avant « Makrout louz »)
+        return min(scores, key=lambda i: (-scores[i], self._name_lengths[i], i))
+
+    def find_by_ingredients(self, query):
+        """
+        Retourne (ingrédients reconnus, [identifiants]) : les recettes qui
+        contiennent tous les ingrédients reconnus dans la requête. Les mots
+        qui ne sont pas des ingrédients connus sont ignorés.
+        """
+        postings = [(term, self._by_ingredient[term]) for term in self._terms(query)
+                    if term in self._by_ingredient]
+        if not postings:
+            return [], []
+        # Intersection en partant de l'ensemble le plus petit
+        postings.sort(key=lambda item: len(item[1]))
+        matches = set(postings[0][1])
+        for _, recipe_ids in postings[1:]:
+            matches &= recipe_ids
+            if not matches:
+                break
+        return [term for term, _ in postings], sorted(matches)
+
+    def names(self):
+        by_category = defaultdict(list)
+        for category, recipe in self.recipes:
+            by_category[category].append(recipe['nom'])
+        return by_category
+
+
+def _fields(recipe, lang):
+    if lang == 'en' and recipe.get('etapes_en'):
+        return recipe.get('ingredients_en', []), recipe.get('etapes_en', [])
+    return recipe.get('ingredients', []), recipe.get('etapes', [])
+
+
+def step_count(recipe, lang):
+    return len(_fields(recipe, lang)[1])
+
+
+def render_recipe(recipe, lang):
+    """Nom, ingrédients et première consigne de navigation."""
+    ingredients, steps = _fields(recipe, lang)
+    items = '\n'.join(f"- {i}" for i in ingredients)
+    if lang == 'fr':
+        return f"🍲 {recipe['nom']}\nIngrédients :\n{items}\n\n{len(steps)} étapes. Tape 'suivant' pour la première étape, ou 'menu'."
+    elif lang == 'en':
+        return f"🍲 {recipe['nom']}\nIngredients:\n{items}\n\n{len(steps)} steps. Type 'next' for the first step, or 'menu'."
+    else:
+        return f"🍲 {recipe['nom']}\nالمكونات:\n{items}\n\n{len(steps)} مراحل. اكتب 'التالي' للمرحلة الأولى، أو 'menu'."
+
+
+def render_step(recipe, index, lang):
+    steps = _fields(recipe, lang)[1]
+    step = steps[index]
+    last = index == len(steps) - 1
+    if lang == 'fr':
+        hint = "Bon appétit ! Tape une autre recette ou 'menu'." if last else "Tape 'suivant' pour continuer."
+        return f"Étape {index + 1}/{len(steps)} : {step}\n{hint}"
+    elif lang == 'en':
+        hint = "Enjoy your meal! Type another recipe or 'menu'." if last else "Type 'next' to continue."
+        return f"Step {index + 1}/{len(steps)}: {step}\n{hint}"
+    else:
+        hint = "بالصحة! اكتب وصفة أخرى أو 'menu'." if last else "اكتب 'التالي' للمتابعة."
+        return f"المرحلة {index + 1}/{len(steps)}: {step}\n{hint}"
+
+
+def render_recipe_list(index, lang):
+    lines = []
+    for category, names in index.names().items():
+        lines.append(f"{category.capitalize()} : {', '.join(names)}")
+    listing = '\n'.join(lines)
+    if lang == 'fr':
+        return f"Recettes disponibles :\n{listing}\n\nTape le nom d'une recette ou des ingrédients (ex : 'semoule et pois chiches')."
+    elif lang == 'en':
+        return f"Available recipes:\n{listing}\n\nType a recipe name or some ingredients (e.g. 'semolina and chickpeas')."
+    else:
+        return f"الوصفات المتوفرة:\n{listing}\n\nاكتب اسم وصفة أو مكونات (مثال: 'semoule et pois chiches')."
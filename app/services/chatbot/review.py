@@ -0,0 +1,388 @@
+"""
+Révision espacée des questions de quiz (boîtes de Leitner).
+
+Chaque question déjà vue par l'utilisateur est dans une boîte (1 à
+len(REVIEW_INTERVALS)) : une bonne réponse la fait monter d'une boîte, une
+mauvaise la renvoie en boîte 1. La boîte fixe le délai avant la prochaine
+révision (CHATBOT_REVIEW_INTERVALS, en secondes).
+
+Par utilisateur et par langue, les questions sont rangées dans un tas trié
+par date de révision : la prochaine question à revoir est en tête (O(1)), la
+replanifier coûte O(log n). Quand rien n'est dû, une question jamais vue est
+introduite, dans l'ordre de la banque (curseur conservé dans l'état).
+
+Les réponses du quiz et du parcours alimentent aussi le planificateur : une
+erreur au quiz revient en révision une minute plus tard.
+
+L'état suit le backend de sessions (CHATBOT_SESSION_BACKEND) : une ligne par
+(utilisateur, langue, question) avec échéance et boîte, plus le curseur et un
+numéro de version par (utilisateur, langue), dans le fichier SQLite des
+sessions (sqlite), dans CHATBOT_REVIEW_DB (memory) ou dans des hashes Redis
+(redis). Pas de durée d'expiration : la révision s'étale sur des jours.
+
+Les états sont gardés en mémoire (LRU de CHATBOT_REVIEW_CACHE états) : un
+message ne relit que le numéro de version, et n'écrit que les questions
+replanifiées. Un état modifié ailleurs (autre worker, autre machine) change de
+version et est relu en entier.
+
+Mesure (tas de 10 000 questions) :
+    python -m app.services.chatbot.review --bench
+"""
+import os
+import sys
+import time
+import heapq
+import sqlite3
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+
+from .sessions import CHATBOT_SESSION_BACKEND, CHATBOT_SESSION_DB, CHATBOT_REDIS_URL, private_db_path
+
+# Initialisation du logger
+logger = logging.getLogger(__name__)
+
+# Délai avant révision pour chaque boîte : 1 min, 1 h, 1 jour, 3 jours, 10 jours
+REVIEW_INTERVALS = tuple(
+    int(x) for x in os.getenv("CHATBOT_REVIEW_INTERVALS", "60,3600,86400,259200,864000").split(",")
+)
+# Fichier des plannings avec le backend de sessions memory
+CHATBOT_REVIEW_DB = os.getenv(
+    "CHATBOT_REVIEW_DB", os.path.join(tempfile.gettempdir(), f"fenn_sessions_{os.getuid()}", "review.db")
+)
+CHATBOT_REVIEW_CACHE = int(os.getenv("CHATBOT_REVIEW_CACHE", "10000"))
+
+# Entrée du tas : [échéance, identifiant, boîte] ; boîte 0 = entrée remplacée (ignorée)
+_DUE, _ID, _BOX = 0, 1, 2
+
+
+class ReviewState:
+    """Planning de révision d'un utilisateur pour une banque de questions."""
+
+    def __init__(self, cursor=0, heap=(), version=0):
+        self.cursor = cursor
+        self.heap = [list(entry) for entry in heap]
+        heapq.heapify(self.heap)
+        self._entries = {entry[_ID]: entry for entry in self.heap}
+        # Version lue dans le store ; questions et curseur modifiés depuis
+        self.version = version
+        self._changed = set()
+        self._cursor_changed = False
+
+    @property
+    def dirty(self):
+        return self._cursor_changed or bool(self._changed)
+
+    def take_changes(self):
+        """(curseur, [(id, échéance, boîte) ; boîte 0 = supprimée]) depuis le dernier appel."""
+        changes = []
+        for question_id in self._changed:
+            entry = self._entries.get(question_id)
+            changes.append((question_id, entry[_DUE], entry[_BOX]) if entry is not None else (question_id, 0, 0))
+        self._changed.clear()
+        self._cursor_changed = False
+        return self.cursor, changes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def box(self, question_id):
+        entry = self._entries.get(question_id)
+        return entry[_BOX] if entry is not None else 0
+
+    def _clean_top(self):
+        # Entrées remplacées par une replanification (voir record)
+        while self.heap and self.heap[0][_BOX] == 0:
+            heapq.heappop(self.heap)
+
+    def next_due(self, bank_order, exists, now=None):
+        """
+        Identifiant de la prochaine question à réviser, ou None. Priorité aux
+        questions dues, puis aux questions jamais vues (ordre de bank_order).
+        exists(id) écarte les questions retirées du contenu.
+        """
+        now = time.time() if now is None else now
+        while True:
+            self._clean_top()
+            if not self.heap or self.heap[0][_DUE] > now:
+                break
+            question_id = self.heap[0][_ID]
+            if exists(question_id):
+                return question_id
+            self._remove(question_id)
+        while self.cursor < len(bank_order):
+            question_id = bank_order[self.cursor]
+            self.cursor += 1
+            self._cursor_changed = True
+            if question_id not in self._entries:
+                self._push(question_id, 1, now)
+                return question_id
+        return None
+
+    def next_review_time(self):
+        self._clean_top()
+        return self.heap[0][_DUE] if self.heap else None
+
+    def record(self, question_id, correct, now=None):
+        """Replanifie la question après une réponse ; retourne sa nouvelle boîte."""
+        now = time.time() if now is None else now
+        entry = self._entries.get(question_id)
+        if entry is None:
+            # Question vue hors révision (quiz, parcours)
+            box = 2 if correct else 1
+        else:
+            box = min(entry[_BOX] + 1, len(REVIEW_INTERVALS)) if correct else 1
+        due = int(now + REVIEW_INTERVALS[box - 1])
+        if entry is not None and self.heap and self.heap[0] is entry:
+            # Cas courant : la question révisée est en tête du tas
+            new_entry = [due, question_id, box]
+            heapq.heapreplace(self.heap, new_entry)
+            self._entries[question_id] = new_entry
+            self._changed.add(question_id)
+            return box
+        if entry is not None:
+            entry[_BOX] = 0
+        self._push(question_id, box, due)
+        return box
+
+    def _push(self, question_id, box, due):
+        entry = [int(due), question_id, box]
+        heapq.heappush(self.heap, entry)
+        self._entries[question_id] = entry
+        self._changed.add(question_id)
+
+    def _remove(self, question_id):
+        entry = self._entries.pop(question_id, None)
+        if entry is not None:
+            entry[_BOX] = 0
+            self._changed.add(question_id)
+
+
+class ReviewStore:
+    """
+    Interface des stores de plannings : load / save par (utilisateur, langue).
+    Les sous-classes lisent l'état complet (_read), sa version (_version) et
+    écrivent les changements (_write, qui retourne la nouvelle version).
+    """
+
+    def __init__(self, cache_size=CHATBOT_REVIEW_CACHE):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _read(self, user_id, lang):
+        raise NotImplementedError
+
+    def _version(self, user_id, lang):
+        raise NotImplementedError
+
+    def _write(self, user_id, lang, cursor, changes):
+        raise NotImplementedError
+
+    def load(self, user_id, lang):
+        key = (user_id, lang)
+        version = self._version(user_id, lang)
+        with self._cache_lock:
+            state = self._cache.get(key)
+            if state is not None and state.version == version:
+                self._cache.move_to_end(key)
+                return state
+        try:
+            state = self._read(user_id, lang)
+        except (ValueError, TypeError) as e:
+            logger.error(f"[REVIEW] État illisible pour {user_id}/{lang}, planning réinitialisé : {e}")
+            state = ReviewState(version=version)
+        self._remember(key, state)
+        return state
+
+    def _remember(self, key, state):
+        if not self.cache_size:
+            return
+        with self._cache_lock:
+            self._cache[key] = state
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def save(self, user_id, lang, state):
+        if not state.dirty:
+            return
+        cursor, changes = state.take_changes()
+        version = self._write(user_id, lang, cursor, changes)
+        if version != state.version + 1:
+            # Écrit ailleurs entre-temps : l'état en mémoire n'a pas ces changements
+            with self._cache_lock:
+                self._cache.pop((user_id, lang), None)
+        state.version = version
+
+    def close(self):
+        pass
+
+
+class SQLiteReviewStore(ReviewStore):
+    """Plannings dans un fichier SQLite (WAL) : une ligne par question vue."""
+
+    def __init__(self, db_path=CHATBOT_REVIEW_DB, **kwargs):
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS review_meta "
+            "(user_id TEXT NOT NULL, lang TEXT NOT NULL, cursor INTEGER NOT NULL, version INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (user_id, lang))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS review_entries "
+            "(user_id TEXT NOT NULL, lang TEXT NOT NULL, question_id INTEGER NOT NULL, due INTEGER NOT NULL, "
+            "box INTEGER NOT NULL, PRIMARY KEY (user_id, lang, question_id))"
+        )
+        self._db.commit()
+
+    def _version(self, user_id, lang):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version FROM review_meta WHERE user_id = ? AND lang = ?", (user_id, lang)
+            ).fetchone()
+        return row[0] if row is not None else 0
+
+    def _read(self, user_id, lang):
+        with self._lock:
+            meta = self._db.execute(
+                "SELECT cursor, version FROM review_meta WHERE user_id = ? AND lang = ?", (user_id, lang)
+            ).fetchone()
+            rows = self._db.execute(
+                "SELECT due, question_id, box FROM review_entries WHERE user_id = ? AND lang = ?", (user_id, lang)
+            ).fetchall()
+        cursor, version = meta if meta is not None else (0, 0)
+        return ReviewState(cursor, rows, version)
+
+    def _write(self, user_id, lang, cursor, changes):
+        upserts = [(user_id, lang, qid, due, box) for qid, due, box in changes if box]
+        deletes = [(user_id, lang, qid) for qid, _, box in changes if not box]
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO review_entries (user_id, lang, question_id, due, box) "
+                    "VALUES (?, ?, ?, ?, ?)", upserts
+                )
+                self._db.executemany(
+                    "DELETE FROM review_entries WHERE user_id = ? AND lang = ? AND question_id = ?", deletes
+                )
+                self._db.execute(
+                    "INSERT INTO review_meta (user_id, lang, cursor, version, updated_at) VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT (user_id, lang) DO UPDATE SET cursor = excluded.cursor, "
+                    "version = version + 1, updated_at = excluded.updated_at",
+                    (user_id, lang, cursor, time.time()),
+                )
+                return self._db.execute(
+                    "SELECT version FROM review_meta WHERE user_id = ? AND lang = ?", (user_id, lang)
+                ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RedisReviewStore(ReviewStore):
+    """
+    Plannings dans Redis : un hash par (utilisateur, langue), champ = identifiant
+    de question, valeur = "échéance,boîte" ; curseur et version dans un hash à
+    part. `client` est injectable (hget/hgetall/hset/hdel/hincrby), comme
+    le FakeRedis des tests.
+    """
+
+    def __init__(self, client=None, url=CHATBOT_REDIS_URL, prefix="fenn:review:", **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _keys(self, user_id, lang):
+        base = f"{self.prefix}{user_id}:{lang}"
+        return f"{base}:meta", f"{base}:entries"
+
+    def _version(self, user_id, lang):
+        version = self.client.hget(self._keys(user_id, lang)[0], "version")
+        return int(version) if version is not None else 0
+
+    def _read(self, user_id, lang):
+        meta_key, entries_key = self._keys(user_id, lang)
+        meta = self.client.hgetall(meta_key)
+        heap = []
+        for qid, value in self.client.hgetall(entries_key).items():
+            due, box = value.split(b",") if isinstance(value, bytes) else value.split(",")
+            heap.append((int(due), int(qid), int(box)))
+        meta = {k.decode() if isinstance(k, bytes) else k: int(v) for k, v in meta.items()}
+        return ReviewState(meta.get("cursor", 0), heap, meta.get("version", 0))
+
+    def _write(self, user_id, lang, cursor, changes):
+        meta_key, entries_key = self._keys(user_id, lang)
+        upserts = {str(qid): f"{due},{box}" for qid, due, box in changes if box}
+        deletes = [str(qid) for qid, _, box in changes if not box]
+        if upserts:
+            self.client.hset(entries_key, mapping=upserts)
+        if deletes:
+            self.client.hdel(entries_key, *deletes)
+        self.client.hset(meta_key, "cursor", cursor)
+        return int(self.client.hincrby(meta_key, "version", 1))
+
+
+def create_review_store(backend=CHATBOT_SESSION_BACKEND):
+    """Store de plannings sur le même support que les sessions (voir sessions.create_session_store)."""
+    if backend == "sqlite":
+        return SQLiteReviewStore(private_db_path(CHATBOT_SESSION_DB))
+    if backend == "redis":
+        return RedisReviewStore()
+    if backend == "memory":
+        return SQLiteReviewStore(private_db_path(CHATBOT_REVIEW_DB))
+    raise ValueError(f"Backend de sessions inconnu : {backend} (memory, sqlite, redis)")
+
+
+def _bench(size=10_000, rounds=2_000):
+    """Un message de révision (lecture, choix, réponse, écriture) sur un planning de `size` questions."""
+    import random
+
+    rng = random.Random(0)
+    now = time.time()
+    order = rng.sample(range(2 ** 32), size)  # identifiants de quiz_bank (32 bits)
+    exists = lambda _: True
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReviewStore(os.path.join(tmp, "review.db"))
+        # Historique : toutes les questions déjà vues (quiz), échéances étalées
+        state = store.load("u", "fr")
+        for qid in order:
+            state.record(qid, rng.random() < 0.7, now=now - rng.randint(0, 20 * 86400))
+        state.cursor = len(order)
+        store.save("u", "fr", state)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            state = store.load("u", "fr")
+            qid = state.next_due(order, exists, now=now)
+            store.save("u", "fr", state)
+            if qid is None:
+                break
+            state.record(qid, rng.random() < 0.7, now=now)
+            store.save("u", "fr", state)
+        elapsed = time.perf_counter() - start
+        cold = SQLiteReviewStore(store.db_path, cache_size=0)
+        start = time.perf_counter()
+        reloaded = cold.load("u", "fr")
+        cold_elapsed = time.perf_counter() - start
+        print(f"{size} questions : message de révision {elapsed / rounds * 1e3:.2f} ms, "
+              f"première lecture {cold_elapsed * 1e3:.1f} ms")
+        assert reloaded.next_review_time() == state.next_review_time() and len(reloaded) == len(state)
+        cold.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        _bench()
+    else:
+        print(__doc__)
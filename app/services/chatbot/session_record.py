@@ -0,0 +1,192 @@
+"""
+Enregistrement compact d'une session du chatbot.
+
+ChatSession remplace le dict de session : champs déclarés en __slots__, et
+des références (identifiants dans la banque de questions compilée de
+l'instantané de contenu, voir quiz_bank) au lieu de copies des questions. L'interface reste celle d'un dict
+(session['state'], session.get(...), 'clé' in session, pop, ...) pour les
+handlers existants.
+
+Affecter None à un champ le supprime : un champ absent et un champ à None
+sont équivalents, ce qui permet une sérialisation positionnelle très courte
+(voir to_compact).
+
+Benchmark mémoire (100 000 sessions simulées) :
+    python -m app.services.chatbot.session_record --bench
+"""
+import sys
+
+# Ordre figé : la sérialisation est positionnelle. Ajouter les nouveaux champs à la fin.
+FIELDS = (
+    'state', 'language',
+    'quiz_level', 'quiz_question_index', 'quiz_question',
+    'learning_level', 'learning_question_index',
+    'challenge_level', 'challenge_questions', 'challenge_index', 'challenge_score',
+    'challenge_start_time', 'challenge_question_time',
+    'context_source', 'context_key', 'context_page',
+    'recipe_id', 'recipe_step',
+    'review_question',
+)
+_FIELD_SET = frozenset(FIELDS)
+
+
+class ChatSession:
+    """Session d'un utilisateur : quelques dizaines d'octets une fois sérialisée."""
+
+    __slots__ = FIELDS + ('_extra',)
+
+    def __init__(self, **fields):
+        self._extra = None
+        for key, value in fields.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        try:
+            if key in _FIELD_SET:
+                return getattr(self, key)
+            if self._extra is not None:
+                return self._extra[key]
+        except AttributeError:
+            pass
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if value is None:
+            self.pop(key, None)
+        elif key in _FIELD_SET:
+            setattr(self, key, value)
+        else:
+            # Clé non déclarée : conservée à part, le temps de l'ajouter à FIELDS
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (ChatSession, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ChatSession({dict(self.items())!r})"
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        if key in _FIELD_SET:
+            delattr(self, key)
+        else:
+            del self._extra[key]
+        return value
+
+    def keys(self):
+        keys = [f for f in FIELDS if hasattr(self, f)]
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_compact(self):
+        """Liste positionnelle alignée sur FIELDS (None = absent), plus les clés non déclarées."""
+        values = [getattr(self, f, None) for f in FIELDS]
+        if self._extra:
+            values.append(self._extra)
+        else:
+            while values and values[-1] is None:
+                values.pop()
+        return values
+
+    @classmethod
+    def from_compact(cls, values):
+        session = cls()
+        for key, value in zip(FIELDS, values):
+            if value is not None:
+                session[key] = tuple(value) if key == 'challenge_questions' else value
+        if len(values) > len(FIELDS) and values[len(FIELDS)]:
+            session._extra = dict(values[len(FIELDS)])
+        return session
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+_MISSING = object()
+
+
+def _bench(count=100_000):
+    """Compare l'ancien dict de session (questions copiées) et ChatSession."""
+    import json
+    import random
+    import tracemalloc
+
+    rng = random.Random(0)
+    bank = [
+        {"question": f"Comment dit-on 'mot {i}' en anglais ?", "choices": [f"w{i}", "apple", "banana", "fig"], "answer": f"w{i}"}
+        for i in range(200)
+    ]
+
+    def legacy(i):
+        q = bank[i % len(bank)]
+        return {
+            'state': 'in_quiz_level', 'language': 'fr', 'quiz_level': 'beginner', 'quiz_question_index': i % 50,
+            'current_quiz': {
+                'question': q['question'],
+                'options': {chr(65 + j).lower(): opt for j, opt in enumerate(q['choices'])},
+                'answer': q['answer'][0].lower(),
+            },
+            'challenge_questions': rng.sample(bank, 5),
+            'challenge_index': 2, 'challenge_score': 1, 'challenge_level': 'beginner',
+        }
+
+    def compact(i):
+        return ChatSession(
+            state='in_quiz_level', language='fr', quiz_level='beginner', quiz_question_index=i % 50,
+            quiz_question=i % len(bank), challenge_questions=tuple(rng.sample(range(len(bank)), 5)),
+            challenge_index=2, challenge_score=1, challenge_level='beginner',
+        )
+
+    for label, build, encode in (
+        ("dict + questions copiées", legacy, lambda s: json.dumps(s, ensure_ascii=False, separators=(',', ':'))),
+        ("ChatSession + références", compact, lambda s: json.dumps(s.to_compact(), ensure_ascii=False, separators=(',', ':'))),
+    ):
+        tracemalloc.start()
+        sessions = {f"user-{i}": build(i) for i in range(count)}
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = sum(len(encode(s).encode('utf-8')) for s in list(sessions.values())[:1000]) / 1000
+        print(f"{label:<28} {current / count:8.0f} octets/session en mémoire | {size:6.0f} octets sérialisés")
+        del sessions
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        _bench()
+    else:
+        print(__doc__)
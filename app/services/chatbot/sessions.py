@@ -0,0 +1,583 @@
+"""
+Stockage des sessions du chatbot.
+
+SessionStore définit l'interface utilisée par process_input et les handlers
+(compatible avec l'ancien dict user_sessions : get, [], in, del). Backends
+(CHATBOT_SESSION_BACKEND) :
+
+- memory : dans le processus, borné (LRU au-delà de CHATBOT_SESSION_MAX
+           sessions, expiration après CHATBOT_SESSION_IDLE_TTL secondes
+           d'inactivité, vérifiée à l'accès et par un thread de nettoyage).
+           Les sessions modifiées sont copiées toutes les
+           CHATBOT_SESSION_SNAPSHOT_INTERVAL secondes (et à l'arrêt) dans un
+           fichier SQLite (CHATBOT_SESSION_SNAPSHOT) : après un redéploiement,
+           chaque session y est relue au premier accès de son utilisateur ;
+- sqlite : fichier SQLite en mode WAL (CHATBOT_SESSION_DB), partagé par les
+           workers d'une même machine ;
+- redis  : serveur Redis (CHATBOT_REDIS_URL), partagé entre machines.
+
+process_input ouvre une transaction par message (transaction(user_id)) : la
+session est lue une fois, les handlers travaillent sur cette copie, et elle
+n'est réécrite qu'une fois à la fin, seulement si elle a changé.
+
+Les trois backends sont vérifiés par tests/test_sessions.py (Redis simulé
+par tests/conftest.py).
+"""
+import os
+import json
+import stat
+import time
+import sqlite3
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from .metrics import counter, gauge
+from .session_record import ChatSession
+
+# Initialisation du logger
+logger = logging.getLogger(__name__)
+
+CHATBOT_SESSION_MAX = int(os.getenv("CHATBOT_SESSION_MAX", "50000"))
+# Inactivité (secondes) au-delà de laquelle une session est oubliée
+CHATBOT_SESSION_IDLE_TTL = float(os.getenv("CHATBOT_SESSION_IDLE_TTL", "86400"))
+CHATBOT_SESSION_SWEEP_INTERVAL = float(os.getenv("CHATBOT_SESSION_SWEEP_INTERVAL", "60"))
+CHATBOT_SESSION_BACKEND = os.getenv("CHATBOT_SESSION_BACKEND", "memory").lower()
+CHATBOT_SESSION_DB = os.getenv(
+    "CHATBOT_SESSION_DB", os.path.join(tempfile.gettempdir(), f"fenn_sessions_{os.getuid()}", "sessions.db")
+)
+CHATBOT_REDIS_URL = os.getenv("CHATBOT_REDIS_URL", "redis://localhost:6379/0")
+# Instantanés du backend memory ; chemin vide = pas de persistance. Le défaut (dossier
+# temporaire privé, propre à l'utilisateur) ne survit pas au remplacement du conteneur :
+# en production, un disque persistant
+CHATBOT_SESSION_SNAPSHOT = os.getenv(
+    "CHATBOT_SESSION_SNAPSHOT", os.path.join(tempfile.gettempdir(), f"fenn_sessions_{os.getuid()}", "snapshot.db")
+)
+CHATBOT_SESSION_SNAPSHOT_INTERVAL = float(os.getenv("CHATBOT_SESSION_SNAPSHOT_INTERVAL", "10"))
+
+_MISSING = object()
+
+
+def private_db_path(path):
+    """
+    Prépare le fichier SQLite `path` : dossier créé en mode 0700 s'il manque,
+    fichier créé en mode 0600. Lève PermissionError si le dossier ou le fichier
+    appartient à un autre utilisateur ou si le dossier est accessible en écriture à d'autres.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise PermissionError(f"Dossier non privé : {directory} (doit appartenir à l'utilisateur courant)")
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600))
+    if os.lstat(path).st_uid != os.getuid():
+        raise PermissionError(f"Fichier d'un autre utilisateur : {path}")
+    return path
+
+
+def encode_session(session):
+    """Sérialisation compacte (JSON sans espaces, UTF-8) ; ChatSession en liste positionnelle."""
+    if isinstance(session, ChatSession):
+        session = session.to_compact()
+    return json.dumps(session, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_session(data):
+    value = json.loads(data)
+    # Les sessions écrites avant ChatSession sont des dicts
+    return ChatSession.from_dict(value) if isinstance(value, dict) else ChatSession.from_compact(value)
+
+
+class _Transaction:
+    __slots__ = ('session', 'fingerprint', 'depth')
+
+    def __init__(self, session, fingerprint):
+        self.session = session
+        self.fingerprint = fingerprint
+        self.depth = 1
+
+
+class SessionStore:
+    """
+    Interface commune des backends de sessions : user_id -> dict de session.
+    Les backends implémentent load/save/delete ; l'accès façon dict passe par
+    la transaction en cours quand il y en a une.
+    """
+
+    sweep_interval = 0
+
+    def __init__(self):
+        # Transactions ouvertes par le thread courant : user_id -> _Transaction
+        self._local = threading.local()
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    def load(self, user_id):
+        """Session de `user_id`, ou None."""
+        raise NotImplementedError
+
+    def save(self, user_id, session):
+        raise NotImplementedError
+
+    def delete(self, user_id):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def stats(self):
+        return {"size": len(self)}
+
+    def sweep(self):
+        """Supprime les sessions expirées ; retourne leur nombre."""
+        return 0
+
+    def flush(self):
+        """Persiste les écritures en attente ; retourne leur nombre."""
+        return 0
+
+    def fingerprint(self, session):
+        # Sert à ne réécrire la session que si elle a changé pendant la transaction
+        return None if session is None else encode_session(session)
+
+    # Transaction par message : une lecture au début, au plus une écriture à la fin
+    def _transactions(self):
+        try:
+            return self._local.open
+        except AttributeError:
+            self._local.open = {}
+            return self._local.open
+
+    @contextmanager
+    def transaction(self, user_id):
+        # Réentrant : process_input s'appelle lui-même pour réafficher le menu
+        open_transactions = self._transactions()
+        tx = open_transactions.get(user_id)
+        if tx is not None:
+            tx.depth += 1
+        else:
+            session = self.load(user_id)
+            tx = open_transactions[user_id] = _Transaction(session, self.fingerprint(session))
+        try:
+            yield
+        finally:
+            tx.depth -= 1
+            if tx.depth == 0:
+                del open_transactions[user_id]
+                if tx.session is None:
+                    if tx.fingerprint is not None:
+                        self.delete(user_id)
+                elif self.fingerprint(tx.session) != tx.fingerprint:
+                    self.save(user_id, tx.session)
+
+    def _read(self, user_id):
+        tx = self._transactions().get(user_id)
+        return tx.session if tx is not None else self.load(user_id)
+
+    # Accès façon dict, comme l'ancien user_sessions
+    def get(self, user_id, default=None):
+        session = self._read(user_id)
+        return default if session is None else session
+
+    def __getitem__(self, user_id):
+        session = self._read(user_id)
+        if session is None:
+            raise KeyError(user_id)
+        return session
+
+    def __setitem__(self, user_id, session):
+        tx = self._transactions().get(user_id)
+        if tx is not None:
+            tx.session = session
+        else:
+            self.save(user_id, session)
+
+    def __delitem__(self, user_id):
+        tx = self._transactions().get(user_id)
+        if tx is not None:
+            tx.session = None
+        else:
+            self.delete(user_id)
+
+    def __contains__(self, user_id):
+        return self._read(user_id) is not None
+
+    def pop(self, user_id, default=None):
+        session = self._read(user_id)
+        if session is None:
+            return default
+        del self[user_id]
+        return session
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"[SESSIONS] Erreur de nettoyage : {e}")
+
+    def start_sweeper(self):
+        if self.sweep_interval <= 0 or (self._sweeper is not None and self._sweeper.is_alive()):
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def close(self):
+        self._stop.set()
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Sessions en mémoire du processus, bornées en nombre et en durée d'inactivité.
+
+    snapshot : SQLiteSessionStore recevant périodiquement les sessions modifiées
+    (flush) ; une session absente de la mémoire y est cherchée avant d'être
+    considérée comme nouvelle. Rien n'est relu au démarrage. La lecture se fait
+    hors du verrou du store, et les utilisateurs absents de l'instantané sont
+    retenus (au plus max_size) pour ne pas le relire à chaque message.
+    """
+
+    def __init__(self, max_size=CHATBOT_SESSION_MAX, idle_ttl=CHATBOT_SESSION_IDLE_TTL,
+                 sweep_interval=CHATBOT_SESSION_SWEEP_INTERVAL, name="sessions",
+                 snapshot=None, snapshot_interval=CHATBOT_SESSION_SNAPSHOT_INTERVAL):
+        super().__init__()
+        self.snapshot = snapshot
+        self.snapshot_interval = snapshot_interval
+        # Sessions modifiées depuis le dernier flush : user_id -> session encodée (None = supprimée)
+        self._dirty = {}
+        # Utilisateurs cherchés en vain dans l'instantané (ordre d'insertion, borné)
+        self._absent = OrderedDict()
+        self._snapshotter = None
+        self.restored = counter(f"{name}_restored")
+        self.max_size = max(1, int(max_size))
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        # Ordre d'accès : la session la moins récemment utilisée est en tête
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = counter(f"{name}_evictions")
+        self.expirations = counter(f"{name}_expirations")
+        gauge(f"{name}_size", lambda: len(self))
+
+    def fingerprint(self, session):
+        # Les handlers modifient la session en place : sans instantané, seul un
+        # remplacement impose une écriture ; avec, toute modification doit être vue
+        if self.snapshot is not None:
+            return super().fingerprint(session)
+        return id(session) if session is not None else None
+
+    def _expired(self, last_access, now):
+        return self.idle_ttl and now - last_access > self.idle_ttl
+
+    def load(self, user_id):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(user_id, _MISSING)
+            if entry is _MISSING:
+                if self.snapshot is None or user_id in self._absent:
+                    return None
+                if user_id in self._dirty:
+                    # Évincée avant d'avoir été écrite : la version en attente fait foi
+                    return self._install(user_id, self._pending(user_id), now)
+            else:
+                session, last_access = entry
+                if self._expired(last_access, now):
+                    del self._data[user_id]
+                    self._forget(user_id)
+                    self.expirations.inc()
+                    return None
+                self._data[user_id] = (session, now)
+                self._data.move_to_end(user_id)
+                return session
+        return self._restore(user_id, now)
+
+    def _restore(self, user_id, now):
+        # Première lecture depuis le démarrage (ou depuis une éviction), hors de self._lock
+        try:
+            session = self.snapshot.load(user_id)
+        except Exception as e:
+            logger.error(f"[SESSIONS] Lecture de l'instantané impossible pour {user_id} : {e}")
+            return None
+        with self._lock:
+            entry = self._data.get(user_id, _MISSING)
+            if entry is not _MISSING:
+                # Enregistrée pendant la lecture : la version en mémoire est plus récente
+                self._data.move_to_end(user_id)
+                return entry[0]
+            if user_id in self._dirty:
+                return self._install(user_id, self._pending(user_id), now)
+            if session is None:
+                self._absent[user_id] = True
+                while len(self._absent) > self.max_size:
+                    self._absent.popitem(last=False)
+                return None
+            self.restored.inc()
+            return self._install(user_id, session, now)
+
+    def _pending(self, user_id):
+        # Appelé sous self._lock
+        data = self._dirty[user_id]
+        return None if data is None else decode_session(data)
+
+    def _install(self, user_id, session, now):
+        # Appelé sous self._lock
+        if session is not None:
+            self._data[user_id] = (session, now)
+            self._evict()
+        return session
+
+    def _forget(self, user_id):
+        # Session expirée : supprimée aussi de l'instantané au prochain flush
+        if self.snapshot is not None:
+            self._dirty[user_id] = None
+
+    def _evict(self):
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions.inc()
+
+    def save(self, user_id, session):
+        # Encodée ici, pendant la transaction de l'utilisateur : le thread d'instantané
+        # n'écrit que ces octets, jamais la session vivante qu'un message peut modifier
+        data = encode_session(session) if self.snapshot is not None else None
+        with self._lock:
+            self._data[user_id] = (session, time.time())
+            self._data.move_to_end(user_id)
+            self._evict()
+            if self.snapshot is not None:
+                self._dirty[user_id] = data
+                self._absent.pop(user_id, None)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+            self._forget(user_id)
+
+    def flush(self):
+        if self.snapshot is None:
+            return 0
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+        try:
+            self.snapshot.save_many(dirty.items())
+        except Exception:
+            # Rien n'est perdu : ces sessions seront retentées au prochain flush
+            with self._lock:
+                for user_id, session in dirty.items():
+                    self._dirty.setdefault(user_id, session)
+            raise
+        return len(dirty)
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"[SESSIONS] Erreur d'instantané : {e}")
+
+    def start_sweeper(self):
+        super().start_sweeper()
+        if self.snapshot is None or self.snapshot_interval <= 0:
+            return
+        if self._snapshotter is not None and self._snapshotter.is_alive():
+            return
+        self._stop.clear()
+        self._snapshotter = threading.Thread(target=self._snapshot_loop, name="session-snapshot", daemon=True)
+        self._snapshotter.start()
+
+    def close(self):
+        super().close()
+        if self.snapshot is not None:
+            # Dernier instantané à l'arrêt : les sessions en cours survivent au redéploiement
+            flushed = self.flush()
+            logger.info(f"[SESSIONS] {flushed} session(s) écrite(s) dans l'instantané")
+            self.snapshot.close()
+
+    def __len__(self):
+        return len(self._data)
+
+    def sweep(self):
+        if not self.idle_ttl:
+            return 0
+        now = time.time()
+        removed = 0
+        with self._lock:
+            # Les plus anciens accès sont en tête : on s'arrête à la première session encore active
+            while self._data:
+                user_id, (_, last_access) = next(iter(self._data.items()))
+                if not self._expired(last_access, now):
+                    break
+                del self._data[user_id]
+                self._forget(user_id)
+                removed += 1
+        if removed:
+            self.expirations.inc(removed)
+        return removed
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "size": len(self),
+            "max_size": self.max_size,
+            "idle_ttl": self.idle_ttl,
+            "evictions": self.evictions.value,
+            "expirations": self.expirations.value,
+            "snapshot": str(self.snapshot.db_path) if self.snapshot is not None else None,
+            "pending": len(self._dirty),
+            "restored": self.restored.value,
+        }
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions dans un fichier SQLite (WAL) partagé par les workers d'une machine."""
+
+    def __init__(self, db_path=CHATBOT_SESSION_DB, idle_ttl=CHATBOT_SESSION_IDLE_TTL,
+                 sweep_interval=CHATBOT_SESSION_SWEEP_INTERVAL):
+        super().__init__()
+        self.db_path = db_path
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False, timeout=5)
+        # WAL : lectures concurrentes entre processus pendant qu'un worker écrit
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(user_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def load(self, user_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, updated_at FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None or (self.idle_ttl and time.time() - row[1] > self.idle_ttl):
+            return None
+        return decode_session(row[0])
+
+    def save(self, user_id, session):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?)",
+                (user_id, encode_session(session), time.time()),
+            )
+            self._db.commit()
+
+    def delete(self, user_id):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+            self._db.commit()
+
+    def save_many(self, items):
+        """Écrit (user_id, session ou session encodée) en une seule transaction ; None = suppression."""
+        now = time.time()
+        saved, deleted = [], []
+        for user_id, session in items:
+            if session is None:
+                deleted.append((user_id,))
+            else:
+                data = session if isinstance(session, bytes) else encode_session(session)
+                saved.append((user_id, data, now))
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?)", saved
+            )
+            self._db.executemany("DELETE FROM sessions WHERE user_id = ?", deleted)
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def sweep(self):
+        if not self.idle_ttl:
+            return 0
+        with self._lock:
+            removed = self._db.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.idle_ttl,)
+            ).rowcount
+            self._db.commit()
+        return removed
+
+    def stats(self):
+        return {"backend": "sqlite", "path": str(self.db_path), "size": len(self), "idle_ttl": self.idle_ttl}
+
+    def close(self):
+        super().close()
+        with self._lock:
+            self._db.close()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions dans Redis (une clé par utilisateur, expiration native). `client`
+    est injectable : tout objet avec get/set(ex=)/delete/scan_iter convient,
+    comme le FakeRedis des tests.
+    """
+
+    def __init__(self, client=None, url=CHATBOT_REDIS_URL, prefix="fenn:session:",
+                 idle_ttl=CHATBOT_SESSION_IDLE_TTL):
+        super().__init__()
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.idle_ttl = idle_ttl
+
+    def _key(self, user_id):
+        return f"{self.prefix}{user_id}"
+
+    def load(self, user_id):
+        data = self.client.get(self._key(user_id))
+        return None if data is None else decode_session(data)
+
+    def save(self, user_id, session):
+        ttl = int(self.idle_ttl) if self.idle_ttl else None
+        self.client.set(self._key(user_id), encode_session(session), ex=ttl)
+
+    def delete(self, user_id):
+        self.client.delete(self._key(user_id))
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}*"))
+
+    def stats(self):
+        return {"backend": "redis", "prefix": self.prefix, "idle_ttl": self.idle_ttl}
+
+
+def create_session_store(backend=CHATBOT_SESSION_BACKEND):
+    if backend == "sqlite":
+        store = SQLiteSessionStore(private_db_path(CHATBOT_SESSION_DB))
+    elif backend == "redis":
+        store = RedisSessionStore()
+    elif backend == "memory":
+        snapshot = None
+        if CHATBOT_SESSION_SNAPSHOT:
+            if os.path.abspath(CHATBOT_SESSION_SNAPSHOT).startswith(os.path.abspath(tempfile.gettempdir()) + os.sep):
+                logger.warning(
+                    f"[SESSIONS] Instantané dans un dossier temporaire ({CHATBOT_SESSION_SNAPSHOT}) : "
+                    "définir CHATBOT_SESSION_SNAPSHOT sur un disque persistant pour survivre aux redéploiements"
+                )
+            try:
+                snapshot = SQLiteSessionStore(private_db_path(CHATBOT_SESSION_SNAPSHOT), sweep_interval=0)
+            except PermissionError as e:
+                # Un fichier qu'un autre utilisateur peut écrire ne doit pas être relu : pas d'instantané
+                logger.error(f"[SESSIONS] Instantané désactivé : {e}")
+            else:
+                # Les lignes trop anciennes sont purgées au démarrage, sans rien charger
+                snapshot.sweep()
+        store = InMemorySessionStore(snapshot=snapshot)
+    else:
+        raise ValueError(f"Backend de sessions inconnu : {backend} (memory, sqlite, redis)")
+    logger.info(f"[SESSIONS] Backend '{backend}'")
+    store.start_sweeper()
+    return store
+
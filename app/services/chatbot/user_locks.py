@@ -0,0 +1,43 @@
+"""
+Verrous par utilisateur pour le traitement des messages.
+
+process_input lit, modifie puis réécrit la session de l'utilisateur : deux
+messages du même utilisateur traités en même temps (double envoi depuis
+l'application, plusieurs threads) corrompraient les index de quiz. Chaque
+message prend le verrou de son utilisateur pendant tout son traitement ;
+les messages d'utilisateurs différents restent parallèles.
+
+Les verrous sont répartis sur un nombre fixe de shards (user_id haché) :
+mémoire constante quel que soit le nombre d'utilisateurs, et deux
+utilisateurs ne se bloquent que s'ils tombent sur le même shard
+(probabilité 1/CHATBOT_LOCK_SHARDS). Les verrous sont réentrants :
+process_input s'appelle lui-même pour réafficher le menu.
+
+L'ordre d'arrivée est garanti en amont par ChatExecutor (file asyncio par
+utilisateur) ; les verrous garantissent l'exclusion pour tout autre appelant.
+Ils sont propres au processus : avec plusieurs workers, un même utilisateur
+doit être routé vers le même worker (ou le backend de sessions partagé accepte
+le dernier écrit).
+
+Test de charge : tests/test_user_locks.py.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+CHATBOT_LOCK_SHARDS = int(os.getenv("CHATBOT_LOCK_SHARDS", "1024"))
+
+
+class UserLocks:
+    def __init__(self, shards=CHATBOT_LOCK_SHARDS):
+        self._locks = tuple(threading.RLock() for _ in range(max(1, shards)))
+
+    def lock_for(self, user_id):
+        return self._locks[hash(user_id) % len(self._locks)]
+
+    @contextmanager
+    def hold(self, user_id):
+        lock = self.lock_for(user_id)
+        with lock:
+            yield
+
@@ -0,0 +1,108 @@
+"""Doublures communes aux tests."""
+import os
+import time
+import atexit
+import shutil
+import fnmatch
+import tempfile
+import threading
+
+import pytest
+
+# Avant tout import de l'application : si un test charge chatbot.py, ses fichiers
+# SQLite vont dans un dossier jetable et le contenu n'est pas surveillé
+_TMP = tempfile.mkdtemp(prefix="fenn_tests_")
+atexit.register(shutil.rmtree, _TMP, ignore_errors=True)
+os.environ.setdefault("CHATBOT_SESSION_SNAPSHOT", "")
+os.environ.setdefault("CHATBOT_SESSION_DB", os.path.join(_TMP, "sessions.db"))
+os.environ.setdefault("CHATBOT_REVIEW_DB", os.path.join(_TMP, "review.db"))
+os.environ.setdefault("CONTENT_WATCH_INTERVAL", "0")
+
+
+class FakeRedis:
+    """Sous-ensemble de redis.Redis en mémoire (get/set/delete/scan_iter, hashes)."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _alive(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key):
+        with self._lock:
+            self.calls += 1
+            return self._alive(key, time.time())
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self.calls += 1
+            self._data[key] = (bytes(value), time.time() + ex if ex else None)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            self.calls += 1
+            return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    def _hash(self, key, create=False):
+        value = self._alive(key, time.time())
+        if value is None:
+            value = {}
+            if create:
+                self._data[key] = (value, None)
+        return value
+
+    def hget(self, key, field):
+        with self._lock:
+            self.calls += 1
+            return self._hash(key).get(str(field).encode())
+
+    def hgetall(self, key):
+        with self._lock:
+            self.calls += 1
+            return dict(self._hash(key))
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        with self._lock:
+            self.calls += 1
+            data = self._hash(key, create=True)
+            for k, v in items.items():
+                data[str(k).encode()] = str(v).encode()
+            return len(items)
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            self.calls += 1
+            data = self._hash(key)
+            return sum(1 for f in fields if data.pop(str(f).encode(), None) is not None)
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            self.calls += 1
+            data = self._hash(key, create=True)
+            value = int(data.get(str(field).encode(), b"0")) + amount
+            data[str(field).encode()] = str(value).encode()
+            return value
+
+    def scan_iter(self, match="*"):
+        now = time.time()
+        with self._lock:
+            keys = [k for k in list(self._data) if self._alive(k, now) is not None]
+        return iter([k for k in keys if fnmatch.fnmatchcase(k, match)])
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
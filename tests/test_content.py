@@ -0,0 +1,47 @@
+"""ContentRegistry : résultat des validateurs gardé dans l'instantané, fichiers partiellement invalides."""
+import json
+import os
+
+from app.services.chatbot.content import ContentRegistry, validated_key
+from app.services.chatbot.quiz_bank import compile_quiz_bank
+
+GOOD = {"question": "Q1", "choices": ["a1", "b1"], "answer": "a1"}
+BAD = {"question": "Q2", "choices": ["x", "y"], "answer": "z"}
+
+
+def write(path, data, mtime):
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def registry(tmp_path):
+    return ContentRegistry(
+        tmp_path, {"quiz": "quiz.json", "other": "other.json"}, {"quiz": compile_quiz_bank}, check_interval=0
+    )
+
+
+def test_validator_result_is_kept_and_reused(tmp_path):
+    write(tmp_path / "quiz.json", {"beginner": [GOOD]}, 1)
+    write(tmp_path / "other.json", {}, 1)
+    content = registry(tmp_path)
+    bank = content.current().derived(validated_key("quiz"), lambda snapshot: None)
+    assert len(bank) == 1
+
+    write(tmp_path / "other.json", {"k": "v"}, 2)
+    assert content.reload()["changed"] == ["other"]
+    assert content.current().derived(validated_key("quiz"), lambda snapshot: None) is bank
+
+
+def test_partially_invalid_file_kept_at_startup_refused_on_reload(tmp_path):
+    write(tmp_path / "quiz.json", {"beginner": [GOOD, BAD]}, 1)
+    write(tmp_path / "other.json", {}, 1)
+    content = registry(tmp_path)
+    assert content.current()["quiz"] == {"beginner": [GOOD, BAD]}
+    assert "quiz" in content.last_errors
+
+    write(tmp_path / "quiz.json", {"beginner": [GOOD]}, 2)
+    assert content.reload()["errors"] == {}
+    write(tmp_path / "quiz.json", {"beginner": [GOOD, BAD, dict(GOOD, question="Q3")]}, 3)
+    report = content.reload()
+    assert "quiz" in report["errors"]
+    assert content.current()["quiz"] == {"beginner": [GOOD]}
@@ -0,0 +1,33 @@
+"""Parité des moteurs du correcteur grammatical avec le pipeline transformers (référence)."""
+import pytest
+
+from app.services.chatbot.grammar_engines import PARITY_CORPUS, load_engine
+
+# Dépendance supplémentaire de chaque moteur, en plus de transformers
+ENGINE_DEPENDENCIES = {
+    "int8": "torch",
+    "onnx": "optimum.onnxruntime",
+}
+
+
+@pytest.fixture(scope="module")
+def expected():
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    return load_engine("transformers").correct_batch(PARITY_CORPUS)
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError, match="inconnu"):
+        load_engine("tensorrt")
+
+
+@pytest.mark.parametrize("name", sorted(ENGINE_DEPENDENCIES))
+def test_engine_matches_transformers(name, expected):
+    pytest.importorskip(ENGINE_DEPENDENCIES[name])
+    got = load_engine(name).correct_batch(PARITY_CORPUS)
+    mismatches = [
+        (sentence, want, have)
+        for sentence, want, have in zip(PARITY_CORPUS, expected, got) if want.strip() != have.strip()
+    ]
+    assert not mismatches, "\n".join(f"{s!r} : attendu {w!r}, obtenu {h!r}" for s, w, h in mismatches)
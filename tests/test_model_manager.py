@@ -0,0 +1,34 @@
+"""ModelManager : état d'échec et reprise du chargement."""
+import time
+
+from app.services.chatbot.model_manager import ModelManager
+
+
+def test_failed_load_is_reported_then_retried():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("poids introuvables")
+        return "modèle"
+
+    manager = ModelManager("test", loader, retry_delays=(0.2,))
+    manager.start()
+    assert manager.get(timeout=5) is None
+    assert manager.failed()
+    status = manager.status()
+    assert status["state"] == "failed" and status["error"] == "poids introuvables"
+
+    deadline = time.time() + 5
+    while manager.failed() and time.time() < deadline:
+        time.sleep(0.02)
+    assert manager.get(timeout=0) == "modèle"
+    assert not manager.failed()
+    assert manager.status()["state"] == "ready" and manager.status()["attempts"] == 2
+
+
+def test_no_retry_left():
+    manager = ModelManager("test", lambda: 1 / 0, retry_delays=())
+    assert manager.get(timeout=5) is None
+    assert manager.failed() and manager.status()["next_retry_at"] is None
@@ -0,0 +1,31 @@
+"""Normalisation multilingue : table de cas et équivalence avec l'ancienne implémentation NFD."""
+import pytest
+
+from app.services.chatbot.normalizer import _legacy_normalize_text, normalize_darija, normalize_text
+
+
+@pytest.mark.parametrize("func, given, expected", [
+    (normalize_text, "Guerre d'Algérie", "guerre d'algerie"),
+    (normalize_text, "ÉQUIPE NATIONALE", "equipe nationale"),
+    (normalize_text, "Cœur", "coeur"),
+    (normalize_text, "Independence Day", "independence day"),
+    (normalize_text, "الْجَزَائِر", "الجزاير"),
+    (normalize_text, "إستقلال", "استقلال"),
+    (normalize_text, "مدرسة", "مدرسه"),
+    (normalize_text, "مستشفى", "مستشفي"),
+    (normalize_text, "الجـــزائر", "الجزاير"),
+    (normalize_darija, "3ndi 7aja", "andi haja"),
+    (normalize_darija, "n9ra", "nqra"),
+    (normalize_darija, "1954", "1954"),
+])
+def test_normalize(func, given, expected):
+    assert func(given) == expected
+
+
+@pytest.mark.parametrize("sample", [
+    "Équipe nationale de football d'Algérie",
+    "Santé et corps humain",
+    "Ça va très bien",
+])
+def test_matches_legacy_on_latin_text(sample):
+    assert normalize_text(sample) == _legacy_normalize_text(sample)
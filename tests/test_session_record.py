@@ -0,0 +1,53 @@
+"""ChatSession : interface de dict et sérialisation positionnelle."""
+import pytest
+
+from app.services.chatbot.session_record import FIELDS, ChatSession
+from app.services.chatbot.sessions import decode_session, encode_session
+
+
+def test_dict_interface():
+    session = ChatSession(state="main_menu", language="fr")
+    session["quiz_level"] = "beginner"
+    assert session["state"] == "main_menu"
+    assert session.get("quiz_question_index", 0) == 0
+    assert "quiz_level" in session and "challenge_level" not in session
+    assert session.pop("quiz_level") == "beginner"
+    with pytest.raises(KeyError):
+        del session["quiz_level"]
+    assert dict(session.items()) == {"state": "main_menu", "language": "fr"}
+
+
+def test_none_deletes_field():
+    session = ChatSession(state="in_review", review_question=42)
+    session["review_question"] = None
+    assert "review_question" not in session
+    assert session == {"state": "in_review"}
+
+
+def test_compact_drops_trailing_empty_fields():
+    session = ChatSession(state="main_menu", language="fr")
+    assert session.to_compact() == ["main_menu", "fr"]
+
+
+def test_compact_round_trip():
+    session = ChatSession(
+        state="in_challenge", language="ar", challenge_level="beginner", challenge_questions=(3, 1, 4),
+        challenge_index=1, challenge_score=1, review_question=2 ** 32 - 1,
+    )
+    restored = decode_session(encode_session(session))
+    assert restored == session
+    # Relu depuis JSON : la liste redevient un tuple
+    assert restored["challenge_questions"] == (3, 1, 4)
+
+
+def test_undeclared_keys_are_kept():
+    session = ChatSession(state="main_menu", future_field={"a": 1})
+    values = session.to_compact()
+    assert len(values) == len(FIELDS) + 1
+    assert ChatSession.from_compact(values)["future_field"] == {"a": 1}
+
+
+def test_decode_legacy_dict_session():
+    decoded = decode_session(b'{"state":"in_quiz_level","language":"fr","quiz_level":"beginner"}')
+    assert isinstance(decoded, ChatSession)
+    assert decoded == {"state": "in_quiz_level", "language": "fr", "quiz_level": "beginner"}
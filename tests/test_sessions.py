@@ -0,0 +1,119 @@
+"""Backends de sessions : aller-retour, transactions par message et instantané du backend memory."""
+import os
+import sys
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from app.services.chatbot.session_record import ChatSession
+from app.services.chatbot.sessions import (
+    InMemorySessionStore,
+    RedisSessionStore,
+    SQLiteSessionStore,
+    private_db_path,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path, fake_redis):
+    if request.param == "memory":
+        store = InMemorySessionStore(sweep_interval=0)
+    elif request.param == "sqlite":
+        store = SQLiteSessionStore(tmp_path / "sessions.db")
+    else:
+        store = RedisSessionStore(client=fake_redis)
+    yield store
+    store.close()
+
+
+def test_round_trip(store):
+    store["u1"] = ChatSession(state="in_quiz_level", language="fr", quiz_level="beginner", quiz_question_index=4)
+    assert store.get("u1") == {"state": "in_quiz_level", "language": "fr", "quiz_level": "beginner",
+                               "quiz_question_index": 4}
+    assert "u1" in store
+    del store["u1"]
+    assert "u1" not in store
+    assert store.get("u1") is None
+
+
+def test_transaction_keeps_in_place_changes(store):
+    """Scénario d'un message : une lecture, modifications en place, une écriture."""
+    store["u1"] = ChatSession(state="main_menu", language="fr")
+    with store.transaction("u1"):
+        session = store.get("u1")
+        session["state"] = "in_quiz"
+        # Réentrante : process_input s'appelle lui-même pour réafficher le menu
+        with store.transaction("u1"):
+            store["u1"]["quiz_level"] = "beginner"
+    assert store.get("u1") == {"state": "in_quiz", "language": "fr", "quiz_level": "beginner"}
+
+
+def test_transaction_create_and_delete(store):
+    with store.transaction("u2"):
+        store["u2"] = ChatSession(state="waiting_language")
+    assert "u2" in store
+    with store.transaction("u2"):
+        del store["u2"]
+    assert "u2" not in store
+
+
+def test_redis_message_is_one_read_and_one_write(fake_redis):
+    store = RedisSessionStore(client=fake_redis)
+    store["warm"] = ChatSession(state="main_menu")
+    before = fake_redis.calls
+    with store.transaction("warm"):
+        store["warm"]["state"] = "in_context"
+        store.get("warm")
+    assert fake_redis.calls - before == 2
+    assert store.get("warm")["state"] == "in_context"
+
+
+def test_memory_snapshot_restores_sessions_lazily(tmp_path):
+    path = tmp_path / "snapshot.db"
+    store = InMemorySessionStore(sweep_interval=0, snapshot=SQLiteSessionStore(path, sweep_interval=0))
+    with store.transaction("u3"):
+        store["u3"] = ChatSession(state="in_quiz_level", language="fr", quiz_level="beginner", quiz_question_index=4)
+    with store.transaction("u3"):
+        store["u3"]["quiz_question_index"] = 5  # modification en place : doit aussi être persistée
+    store["gone"] = ChatSession(state="main_menu")
+    del store["gone"]
+    store.close()
+
+    restarted = InMemorySessionStore(sweep_interval=0, snapshot=SQLiteSessionStore(path, sweep_interval=0))
+    assert len(restarted) == 0
+    assert restarted.get("u3") == {"state": "in_quiz_level", "language": "fr", "quiz_level": "beginner",
+                                   "quiz_question_index": 5}
+    assert "gone" not in restarted
+    assert restarted.stats()["restored"] == 1
+    restarted.close()
+
+
+def test_snapshot_writes_the_session_as_saved(tmp_path):
+    """Le thread d'instantané écrit la session encodée au save, pas l'objet modifié ensuite."""
+    snapshot = SQLiteSessionStore(tmp_path / "snapshot.db", sweep_interval=0)
+    store = InMemorySessionStore(sweep_interval=0, snapshot=snapshot)
+    session = ChatSession(state="in_quiz_level", quiz_question_index=1)
+    store["u1"] = session
+    session["quiz_question_index"] = 2  # modification hors transaction, après le save
+    store.flush()
+    assert snapshot.get("u1")["quiz_question_index"] == 1
+    store.close()
+
+
+def test_private_db_path(tmp_path):
+    path = private_db_path(str(tmp_path / "private" / "snapshot.db"))
+    assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        private_db_path(str(shared / "snapshot.db"))
+
+
+def test_submodules_do_not_load_chatbot():
+    """Importer sessions ou review ne charge ni le contenu ni les modèles (chatbot.py)."""
+    code = ("import sys, app.services.chatbot.sessions, app.services.chatbot.review; "
+            "sys.exit('app.services.chatbot.chatbot' in sys.modules)")
+    assert subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).resolve().parents[1]).returncode == 0
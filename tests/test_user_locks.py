@@ -0,0 +1,76 @@
+"""
+Messages entrelacés de nombreux utilisateurs, traités comme process_input
+(transaction sur le store, lecture-modification-écriture de la session) :
+avec les verrous, chaque session compte exactement ses messages, dans l'ordre.
+"""
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.chatbot.executor import ChatExecutor
+from app.services.chatbot.session_record import ChatSession
+from app.services.chatbot.sessions import InMemorySessionStore
+from app.services.chatbot.user_locks import UserLocks
+
+USERS, MESSAGES, THREADS = 200, 20, 16
+
+
+def handler(store, locks, user_id, seq=None, errors=None):
+    with locks.hold(user_id), store.transaction(user_id):
+        session = store.get(user_id) or ChatSession(state="in_quiz_level", quiz_question_index=0)
+        idx = session.get("quiz_question_index", 0)
+        if seq is not None and idx != seq:
+            errors.append((user_id, seq, idx))
+        time.sleep(0)  # laisse la main aux autres threads entre lecture et écriture
+        session["quiz_question_index"] = idx + 1
+        store[user_id] = session
+
+
+@pytest.fixture
+def plan():
+    plan = [f"u{u}" for u in range(USERS) for _ in range(MESSAGES)]
+    random.Random(0).shuffle(plan)
+    return plan
+
+
+def lost_updates(store):
+    return sum(MESSAGES - store.get(f"u{u}").get("quiz_question_index", 0) for u in range(USERS))
+
+
+def test_locks_are_reentrant_and_sharded():
+    locks = UserLocks(shards=4)
+    with locks.hold("u1"), locks.hold("u1"):
+        pass
+    assert locks.lock_for("u1") is locks.lock_for("u1")
+    assert len({locks.lock_for(f"u{i}") for i in range(100)}) == 4
+
+
+def test_no_lost_update_across_threads(plan):
+    store, locks = InMemorySessionStore(sweep_interval=0), UserLocks()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        for future in [pool.submit(handler, store, locks, user_id) for user_id in plan]:
+            future.result()
+    assert lost_updates(store) == 0
+
+
+def test_executor_keeps_per_user_order(plan):
+    store, locks, errors = InMemorySessionStore(sweep_interval=0), UserLocks(), []
+    executor = ChatExecutor(max_workers=THREADS)
+    seqs = {}
+
+    async def fire():
+        tasks = []
+        for user_id in plan:
+            seq = seqs[user_id] = seqs.get(user_id, -1) + 1
+            tasks.append(executor.run(user_id, handler, store, locks, user_id, seq, errors))
+        await asyncio.gather(*tasks)
+
+    try:
+        asyncio.run(fire())
+    finally:
+        executor.shutdown()
+    assert lost_updates(store) == 0
+    assert not errors, errors[:5]